@@ -0,0 +1,46 @@
+// Writes .br and .gz siblings for the text assets in build/, so the Flask
+// server can send them without compressing on every request. Runs after
+// `npm run build` via the postbuild script.
+const fs = require('fs');
+const path = require('path');
+const zlib = require('zlib');
+
+const BUILD_DIR = path.join(__dirname, '..', 'build');
+const EXTENSIONS = ['.html', '.js', '.css', '.json', '.svg', '.txt', '.map', '.ico'];
+const MINIMUM_SIZE = 1024;
+
+function* walk(dir) {
+  for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+    const full = path.join(dir, entry.name);
+    if (entry.isDirectory()) {
+      yield* walk(full);
+    } else if (EXTENSIONS.includes(path.extname(entry.name))) {
+      yield full;
+    }
+  }
+}
+
+let before = 0;
+let brotli = 0;
+let gzip = 0;
+for (const file of walk(BUILD_DIR)) {
+  const data = fs.readFileSync(file);
+  if (data.length < MINIMUM_SIZE) continue;
+
+  const br = zlib.brotliCompressSync(data, {
+    params: {
+      [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+      [zlib.constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+    },
+  });
+  const gz = zlib.gzipSync(data, { level: zlib.constants.Z_BEST_COMPRESSION });
+  // A sibling that is not smaller is never worth sending.
+  if (br.length < data.length) fs.writeFileSync(`${file}.br`, br);
+  if (gz.length < data.length) fs.writeFileSync(`${file}.gz`, gz);
+
+  before += data.length;
+  brotli += Math.min(br.length, data.length);
+  gzip += Math.min(gz.length, data.length);
+}
+
+console.log(`Precompressed ${before} bytes: brotli ${brotli}, gzip ${gzip}.`);
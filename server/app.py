@@ -1,17 +1,144 @@
 from flask import request, session, make_response, jsonify
 from flask_restful import Resource
+from sqlalchemy.exc import IntegrityError
+from werkzeug.middleware.proxy_fix import ProxyFix
 import traceback
 import os
 from functools import wraps
-from datetime import datetime
+from datetime import datetime, timedelta
 from random import randint, choice
 
-from config import app, db, api, bcrypt
-from models import User, Letter, TimeCapsule, UserNote, SoulNote
+from config import app, db, api, bcrypt, DATABASE_BACKEND, TRUSTED_PROXIES
+from response_compression import CompressionMiddleware
+from client_assets import client_file, client_index, send_client_file
+import profiling
+from rate_limit import login_limits, signup_limits
+from models import User, Letter, TimeCapsule, UserNote, SoulNote, UserDailyActivity
 
-class ValidationError(Exception):
+class ValidationError(ValueError):
     pass
 
+PREVIEW_LENGTH = 150
+MAX_PREVIEW_LENGTH = 1000
+
+def preview_expression(column, length):
+    prefix = db.func.substr(column, 1, length, type_=db.Text)
+    if DATABASE_BACKEND != 'sqlite':
+        return prefix
+    return db.case(
+        (db.func.typeof(column) == 'blob', db.func.text_preview(column, length, type_=db.Text)),
+        else_=prefix,
+    )
+
+def field_projection(model, preview_source, args):
+    """
+    Reads ?fields= (and ?preview_length=) from the query `args` into query
+    options that only load the requested columns. `preview` is computed in SQL
+    from the start of `preview_source`, so the full body is never read for it.
+    Returns (fields, options); both are empty when every field was requested.
+    """
+    fields = args.get('fields')
+    if not fields:
+        return (), []
+
+    fields = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    if not fields:
+        raise ValidationError("fields must name at least one field.")
+    allowed = set(model.__table__.columns.keys()) | {'preview'}
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValidationError(f"Unknown fields: {', '.join(unknown)}.")
+
+    columns = [getattr(model, field) for field in fields if field != 'preview']
+    options = [db.load_only(*(columns or [model.id]))]
+    if 'preview' in fields:
+        try:
+            length = int(args.get('preview_length', PREVIEW_LENGTH))
+        except ValueError:
+            raise ValidationError("preview_length must be an integer.")
+        if not 1 <= length <= MAX_PREVIEW_LENGTH:
+            raise ValidationError(f"preview_length must be between 1 and {MAX_PREVIEW_LENGTH}.")
+        options.append(db.with_expression(model.preview, preview_expression(preview_source, length)))
+    return fields, options
+
+# The validation and queries behind the resources below are shared with the
+# async mode in asgi.py. Functions that touch the database take the SQLAlchemy
+# session to use, so asgi.py can run them through AsyncSession.run_sync; the
+# caller commits.
+
+def signup_fields(data):
+    """Username, email and password from a signup body, with the confirmation checked."""
+    username = data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+    password_confirmation = data.get('password_confirmation')
+
+    if not all([username, email, password, password_confirmation]):
+        raise ValidationError("All fields are required: username, email, password, password confirmation.")
+    if password != password_confirmation:
+        raise ValidationError("Passwords do not match.")
+    return username, email, password
+
+def login_fields(data):
+    identifier = data.get('identifier')
+    password = data.get('password')
+
+    if not all([identifier, password]):
+        raise ValidationError("Identifier (username or email) and password are required.")
+    return identifier, password
+
+def find_login_user(db_session, identifier):
+    """The user whose username or email is `identifier`, ignoring case."""
+    identifier_ci = db.func.lower(identifier)
+    return db_session.query(User).filter(
+        (db.func.lower(User.username) == identifier_ci) | (db.func.lower(User.email) == identifier_ci)
+    ).first()
+
+class OwnedItems:
+    """
+    List/get/create/update/delete for one user-owned model. Subclasses supply
+    build(user_id, data), which validates a new item, and apply(item, data).
+    """
+    def __init__(self, model, preview_source, order_by, label):
+        self.model = model
+        self.preview_source = preview_source
+        self.order_by = order_by
+        self.label = label
+
+    def list(self, db_session, user_id, args):
+        fields, options = field_projection(self.model, self.preview_source, args)
+        items = db_session.query(self.model).options(*options).filter_by(user_id=user_id).order_by(self.order_by).all()
+        return [item.to_dict(only=fields) for item in items]
+
+    def get(self, db_session, id, user_id, args):
+        """The item as a dict, or None if `user_id` has no item `id`."""
+        fields, options = field_projection(self.model, self.preview_source, args)
+        item = db_session.query(self.model).options(*options).filter_by(id=id, user_id=user_id).first()
+        return item.to_dict(only=fields) if item else None
+
+    def find(self, db_session, id, user_id):
+        return db_session.query(self.model).filter_by(id=id, user_id=user_id).first()
+
+    def create(self, db_session, user_id, data):
+        item = self.build(user_id, data)
+        db_session.add(item)
+        db_session.flush()
+        UserDailyActivity.record(item, 1, db_session)
+        return item
+
+    def update(self, db_session, id, user_id, data):
+        item = self.find(db_session, id, user_id)
+        if item:
+            self.apply(item, data)
+        return item
+
+    def delete(self, db_session, id, user_id):
+        item = self.find(db_session, id, user_id)
+        if item:
+            UserDailyActivity.record(item, -1, db_session)
+            db_session.delete(item)
+        return item
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -24,10 +151,42 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+app.before_request(profiling.start)
+app.after_request(profiling.finish)
+app.teardown_request(profiling.discard)
+
+def too_many_attempts(retry_after):
+    response = make_response(
+        jsonify({"errors": f"Too many attempts. Please try again in {retry_after} seconds."}),
+        429
+    )
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 @app.route('/')
 def index():
+    index_path = client_index()
+    if index_path:
+        return send_client_file(index_path, request.headers.get('Accept-Encoding'))
     return '<h1>SoulSpace API</h1>'
 
+@app.before_request
+def serve_client():
+    # Only GETs that no API route handles: built files, then client-side routes
+    # (e.g. /dashboard/letters, or /login which the API only accepts as POST).
+    rule = request.url_rule
+    if request.method not in ('GET', 'HEAD') or (rule and rule.endpoint != 'static'):
+        return None
+    index_path = client_index()
+    if not index_path:
+        return None
+    path = client_file(request.path)
+    if path is None and request.accept_mimetypes.best == 'text/html':
+        path = index_path
+    if path:
+        return send_client_file(path, request.headers.get('Accept-Encoding'))
+    return None
+
 @app.errorhandler(ValidationError)
 def handle_validation_error(e):
     return make_response(jsonify({"errors": str(e)}), 400)
@@ -53,16 +212,12 @@ class Signup(Resource):
     def post(self):
         try:
             data = request.get_json()
-            username = data.get('username')
-            email = data.get('email')
-            password = data.get('password')
-            password_confirmation = data.get('password_confirmation')
 
-            if not all([username, email, password, password_confirmation]):
-                raise ValidationError("All fields are required: username, email, password, password confirmation.")
-            if password != password_confirmation:
-                raise ValidationError("Passwords do not match.")
+            retry_after = signup_limits.retry_after(data.get('email'), request.remote_addr)
+            if retry_after:
+                return too_many_attempts(retry_after)
 
+            username, email, password = signup_fields(data)
             new_user = User(username=username, email=email)
             new_user.password_hash = password
 
@@ -74,6 +229,13 @@ class Signup(Resource):
         except ValueError as ve:
             db.session.rollback()
             return make_response(jsonify({"errors": str(ve)}), 400)
+        except IntegrityError as ie:
+            db.session.rollback()
+            message = User.uniqueness_error(ie)
+            if message:
+                return make_response(jsonify({"errors": message}), 400)
+            if app.debug: print(f"An unexpected integrity error occurred during signup: {ie}\n{traceback.format_exc()}")
+            return make_response(jsonify({"errors": "Failed to create user: An unexpected error occurred."}), 500)
         except Exception as e:
             db.session.rollback()
             if app.debug: print(f"An unexpected error occurred during signup: {e}\n{traceback.format_exc()}")
@@ -84,19 +246,21 @@ class Login(Resource):
     def post(self):
         try:
             data = request.get_json()
-            identifier = data.get('identifier')
-            password = data.get('password')
 
-            if not all([identifier, password]):
-                raise ValidationError("Identifier (username or email) and password are required.")
+            retry_after = login_limits.retry_after(data.get('identifier'), request.remote_addr)
+            if retry_after:
+                return too_many_attempts(retry_after)
 
-            user = User.query.filter((User.username == identifier) | (User.email == identifier)).first()
+            identifier, password = login_fields(data)
+            user = find_login_user(db.session, identifier)
 
             if not user or not user.authenticate(password):
                 return make_response(jsonify({"errors": "Invalid identifier or password."}), 401)
 
             session['user_id'] = user.id
             return user.to_dict(), 200
+        except ValueError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
         except Exception as e:
             if app.debug: print(f"An unexpected error occurred during login: {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Login failed: An unexpected error occurred."}), 500)
@@ -122,29 +286,35 @@ class Logout(Resource):
 api.add_resource(Logout, '/logout')
 
 # --- Letters Unsent Resources (Keep existing) ---
+class Letters(OwnedItems):
+    def build(self, user_id, data):
+        title = data.get('title')
+        content = data.get('content')
+
+        if not all([title, content]):
+            raise ValidationError("Title and content are required for a letter.")
+        return Letter(user_id=user_id, title=title, content=content)
+
+    def apply(self, letter, data):
+        if 'title' in data: letter.title = data['title']
+        if 'content' in data: letter.content = data['content']
+
+letters = Letters(Letter, Letter.content, Letter.created_at.desc(), "Letter")
+
 class LettersResource(Resource):
     decorators = [login_required]
     def get(self):
         try:
-            user_id = session['user_id']
-            letters = Letter.query.filter_by(user_id=user_id).order_by(Letter.created_at.desc()).all()
-            return [letter.to_dict() for letter in letters], 200
+            return letters.list(db.session, session['user_id'], request.args), 200
+        except ValidationError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
         except Exception as e:
             if app.debug: print(f"Error fetching letters: {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Failed to fetch letters."}), 500)
 
     def post(self):
         try:
-            user_id = session['user_id']
-            data = request.get_json()
-            title = data.get('title')
-            content = data.get('content')
-
-            if not all([title, content]):
-                raise ValidationError("Title and content are required for a letter.")
-
-            new_letter = Letter(user_id=user_id, title=title, content=content)
-            db.session.add(new_letter)
+            new_letter = letters.create(db.session, session['user_id'], request.get_json())
             db.session.commit()
             return new_letter.to_dict(), 201
         except ValueError as ve:
@@ -160,24 +330,20 @@ class LetterByIdResource(Resource):
     decorators = [login_required]
     def get(self, id):
         try:
-            user_id = session['user_id']
-            letter = Letter.query.filter_by(id=id, user_id=user_id).first()
+            letter = letters.get(db.session, id, session['user_id'], request.args)
             if not letter: return make_response(jsonify({"errors": "Letter not found or unauthorized."}), 404)
-            return letter.to_dict(), 200
+            return letter, 200
+        except ValidationError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
         except Exception as e:
             if app.debug: print(f"Error fetching letter (ID: {id}): {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Failed to fetch letter."}), 500)
 
     def patch(self, id):
         try:
-            user_id = session['user_id']
-            letter = Letter.query.filter_by(id=id, user_id=user_id).first()
+            letter = letters.update(db.session, id, session['user_id'], request.get_json())
             if not letter: return make_response(jsonify({"errors": "Letter not found or unauthorized."}), 404)
 
-            data = request.get_json()
-            if 'title' in data: letter.title = data['title']
-            if 'content' in data: letter.content = data['content']
-            
             db.session.commit()
             return letter.to_dict(), 200
         except ValueError as ve:
@@ -190,11 +356,9 @@ class LetterByIdResource(Resource):
 
     def delete(self, id):
         try:
-            user_id = session['user_id']
-            letter = Letter.query.filter_by(id=id, user_id=user_id).first()
+            letter = letters.delete(db.session, id, session['user_id'])
             if not letter: return make_response(jsonify({"errors": "Letter not found or unauthorized."}), 404)
 
-            db.session.delete(letter)
             db.session.commit()
             return make_response(jsonify({"message": "Letter deleted successfully."}), 204)
         except Exception as e:
@@ -203,40 +367,51 @@ class LetterByIdResource(Resource):
             return make_response(jsonify({"errors": "Failed to delete letter."}), 500)
 api.add_resource(LetterByIdResource, '/letters/<int:id>')
 
+class TimeCapsules(OwnedItems):
+    def build(self, user_id, data):
+        message = data.get('message')
+        open_date_str = data.get('open_date')
+
+        if not all([message, open_date_str]):
+            raise ValidationError("Message and open date are required for a time capsule.")
+
+        try:
+            open_date = datetime.fromisoformat(open_date_str)
+        except ValueError:
+            open_date = datetime.strptime(open_date_str, '%Y-%m-%d')
+
+        return TimeCapsule(
+            user_id=user_id,
+            message=message,
+            open_date=open_date
+        )
+
+    def apply(self, time_capsule, data):
+        if 'message' in data:
+            time_capsule.message = data['message']
+        if 'open_date' in data:
+            try:
+                time_capsule.open_date = datetime.fromisoformat(data['open_date'])
+            except ValueError:
+                raise ValueError("Invalid date format for open_date.")
+
+time_capsules = TimeCapsules(TimeCapsule, TimeCapsule.message, TimeCapsule.open_date.asc(), "Time Capsule")
+
 class TimeCapsulesResource(Resource):
     decorators = [login_required]
 
     def get(self):
         try:
-            user_id = session['user_id']
-            time_capsules = TimeCapsule.query.filter_by(user_id=user_id).order_by(TimeCapsule.open_date.asc()).all()
-            return [tc.to_dict() for tc in time_capsules], 200
+            return time_capsules.list(db.session, session['user_id'], request.args), 200
+        except ValidationError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
         except Exception as e:
             if app.debug: print(f"Error fetching time capsules: {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Failed to fetch time capsules."}), 500)
 
     def post(self):
         try:
-            user_id = session['user_id']
-            data = request.get_json()
-            message = data.get('message')
-            open_date_str = data.get('open_date')
-
-            if not all([message, open_date_str]):
-                raise ValidationError("Message and open date are required for a time capsule.")
-
-            try:
-                open_date = datetime.fromisoformat(open_date_str)
-            except ValueError:
-                open_date = datetime.strptime(open_date_str, '%Y-%m-%d')
-
-
-            new_time_capsule = TimeCapsule(
-                user_id=user_id,
-                message=message,
-                open_date=open_date
-            )
-            db.session.add(new_time_capsule)
+            new_time_capsule = time_capsules.create(db.session, session['user_id'], request.get_json())
             db.session.commit()
             return new_time_capsule.to_dict(), 201
         except ValueError as ve:
@@ -254,32 +429,22 @@ class TimeCapsuleByIdResource(Resource):
 
     def get(self, id):
         try:
-            user_id = session['user_id']
-            time_capsule = TimeCapsule.query.filter_by(id=id, user_id=user_id).first()
+            time_capsule = time_capsules.get(db.session, id, session['user_id'], request.args)
             if not time_capsule:
                 return make_response(jsonify({"errors": "Time Capsule not found or unauthorized."}), 404)
-            return time_capsule.to_dict(), 200
+            return time_capsule, 200
+        except ValidationError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
         except Exception as e:
             if app.debug: print(f"Error fetching time capsule (ID: {id}): {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Failed to fetch time capsule."}), 500)
 
     def patch(self, id):
         try:
-            user_id = session['user_id']
-            time_capsule = TimeCapsule.query.filter_by(id=id, user_id=user_id).first()
+            time_capsule = time_capsules.update(db.session, id, session['user_id'], request.get_json())
             if not time_capsule:
                 return make_response(jsonify({"errors": "Time Capsule not found or unauthorized."}), 404)
 
-            data = request.get_json()
-            if 'message' in data:
-                time_capsule.message = data['message']
-            if 'open_date' in data:
-                try:
-                    open_date = datetime.fromisoformat(data['open_date'])
-                    time_capsule.open_date = open_date
-                except ValueError:
-                    return make_response(jsonify({"errors": "Invalid date format for open_date."}), 400)
-            
             db.session.commit()
             return time_capsule.to_dict(), 200
         except ValueError as ve:
@@ -292,12 +457,10 @@ class TimeCapsuleByIdResource(Resource):
 
     def delete(self, id):
         try:
-            user_id = session['user_id']
-            time_capsule = TimeCapsule.query.filter_by(id=id, user_id=user_id).first()
+            time_capsule = time_capsules.delete(db.session, id, session['user_id'])
             if not time_capsule:
                 return make_response(jsonify({"errors": "Time Capsule not found or unauthorized."}), 404)
 
-            db.session.delete(time_capsule)
             db.session.commit()
             return make_response(jsonify({"message": "Time Capsule deleted successfully."}), 204)
         except Exception as e:
@@ -307,32 +470,39 @@ class TimeCapsuleByIdResource(Resource):
 api.add_resource(TimeCapsuleByIdResource, '/time_capsules/<int:id>')
 
 
+class UserNotes(OwnedItems):
+    def build(self, user_id, data):
+        content = data.get('content')
+
+        if not content:
+            raise ValidationError("Content is required for a user note.")
+
+        return UserNote(
+            user_id=user_id,
+            content=content
+        )
+
+    def apply(self, user_note, data):
+        if 'content' in data:
+            user_note.content = data['content']
+
+user_notes = UserNotes(UserNote, UserNote.content, UserNote.created_at.desc(), "User Note")
+
 class UserNotesResource(Resource):
     decorators = [login_required]
 
     def get(self):
         try:
-            user_id = session['user_id']
-            user_notes = UserNote.query.filter_by(user_id=user_id).order_by(UserNote.created_at.desc()).all()
-            return [note.to_dict() for note in user_notes], 200
+            return user_notes.list(db.session, session['user_id'], request.args), 200
+        except ValidationError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
         except Exception as e:
             if app.debug: print(f"Error fetching user notes: {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Failed to fetch user notes."}), 500)
 
     def post(self):
         try:
-            user_id = session['user_id']
-            data = request.get_json()
-            content = data.get('content')
-
-            if not content:
-                raise ValidationError("Content is required for a user note.")
-
-            new_user_note = UserNote(
-                user_id=user_id,
-                content=content
-            )
-            db.session.add(new_user_note)
+            new_user_note = user_notes.create(db.session, session['user_id'], request.get_json())
             db.session.commit()
             return new_user_note.to_dict(), 201
         except ValueError as ve:
@@ -349,26 +519,22 @@ class UserNoteByIdResource(Resource):
 
     def get(self, id):
         try:
-            user_id = session['user_id']
-            user_note = UserNote.query.filter_by(id=id, user_id=user_id).first()
+            user_note = user_notes.get(db.session, id, session['user_id'], request.args)
             if not user_note:
                 return make_response(jsonify({"errors": "User Note not found or unauthorized."}), 404)
-            return user_note.to_dict(), 200
+            return user_note, 200
+        except ValidationError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
         except Exception as e:
             if app.debug: print(f"Error fetching user note (ID: {id}): {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Failed to fetch user note."}), 500)
 
     def patch(self, id):
         try:
-            user_id = session['user_id']
-            user_note = UserNote.query.filter_by(id=id, user_id=user_id).first()
+            user_note = user_notes.update(db.session, id, session['user_id'], request.get_json())
             if not user_note:
                 return make_response(jsonify({"errors": "User Note not found or unauthorized."}), 404)
 
-            data = request.get_json()
-            if 'content' in data:
-                user_note.content = data['content']
-            
             db.session.commit()
             return user_note.to_dict(), 200
         except ValueError as ve:
@@ -381,12 +547,10 @@ class UserNoteByIdResource(Resource):
 
     def delete(self, id):
         try:
-            user_id = session['user_id']
-            user_note = UserNote.query.filter_by(id=id, user_id=user_id).first()
+            user_note = user_notes.delete(db.session, id, session['user_id'])
             if not user_note:
                 return make_response(jsonify({"errors": "User Note not found or unauthorized."}), 404)
 
-            db.session.delete(user_note)
             db.session.commit()
             return make_response(jsonify({"message": "User Note deleted successfully."}), 204)
         except Exception as e:
@@ -395,6 +559,66 @@ class UserNoteByIdResource(Resource):
             return make_response(jsonify({"errors": "Failed to delete user note."}), 500)
 api.add_resource(UserNoteByIdResource, '/user_notes/<int:id>')
 
+ACTIVITY_DEFAULT_DAYS = 30
+
+def parse_day(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(f"{name} must be a date in YYYY-MM-DD format.")
+
+def activity_filters(user_id, args):
+    """Filters selecting `user_id`'s non-empty rollup rows between ?from= and ?to=."""
+    to_day = parse_day(args, 'to') or datetime.utcnow().date()
+    from_day = parse_day(args, 'from') or to_day - timedelta(days=ACTIVITY_DEFAULT_DAYS - 1)
+    if from_day > to_day:
+        raise ValidationError("from must not be after to.")
+    return [
+        UserDailyActivity.user_id == user_id,
+        UserDailyActivity.day.between(from_day, to_day),
+        UserDailyActivity.letter_count + UserDailyActivity.note_count + UserDailyActivity.capsule_count > 0,
+    ]
+
+def activity_days(db_session, user_id, args):
+    days = db_session.query(UserDailyActivity).filter(
+        *activity_filters(user_id, args)
+    ).order_by(UserDailyActivity.day.asc()).all()
+    return [day.to_dict() for day in days]
+
+class ActivityResource(Resource):
+    """
+    Handles GET for the session user's daily writing activity between ?from= and
+    ?to= (inclusive, YYYY-MM-DD, UTC), read from the user_daily_activity rollup.
+    Defaults to the last 30 days.
+    """
+    decorators = [login_required]
+
+    def get(self):
+        try:
+            return activity_days(db.session, session['user_id'], request.args), 200
+        except ValidationError as ve:
+            return make_response(jsonify({"errors": str(ve)}), 400)
+        except Exception as e:
+            if app.debug: print(f"Error fetching activity: {e}\n{traceback.format_exc()}")
+            return make_response(jsonify({"errors": "Failed to fetch activity."}), 500)
+api.add_resource(ActivityResource, '/me/activity')
+
+
+def random_soul_note(db_session):
+    """A random SoulNote, as (body, status)."""
+    count = db_session.query(SoulNote).count()
+    if count == 0:
+        return {"message": "No soul notes available."}, 200
+
+    random_offset = max(0, randint(0, count - 1))
+    soul_note = db_session.query(SoulNote).offset(random_offset).limit(1).first()
+
+    if not soul_note:
+        return {"message": "Could not retrieve a random soul note."}, 404
+    return soul_note.to_dict(), 200
 
 class RandomSoulNoteResource(Resource):
     """
@@ -402,81 +626,93 @@ class RandomSoulNoteResource(Resource):
     """
     def get(self):
         try:
-            count = db.session.query(SoulNote).count()
-            if count == 0:
-                return make_response(jsonify({"message": "No soul notes available."}), 200)
-            
-            random_offset = max(0, randint(0, count - 1))
-            soul_note = SoulNote.query.offset(random_offset).limit(1).first()
-
-            if not soul_note:
-                return make_response(jsonify({"message": "Could not retrieve a random soul note."}), 404)
-            return soul_note.to_dict(), 200
+            return random_soul_note(db.session)
         except Exception as e:
             if app.debug: print(f"Error fetching random soul note: {e}\n{traceback.format_exc()}")
             return make_response(jsonify({"errors": "Failed to retrieve soul note."}), 500)
 api.add_resource(RandomSoulNoteResource, '/soul_notes/random')
 
 
+LOOP_BREAKER_PROMPTS = [
+    "What is one small thing you can do right now to shift your focus?",
+    "Identify one thought you're stuck on. Is it truly serving you?",
+    "Close your eyes and focus on five things you can hear.",
+    "If this feeling were a cloud, what shape would it be? Watch it drift.",
+    "Name three things you are grateful for in this exact moment.",
+    "What would a wise friend advise you to do right now?",
+    "Consider your breath. Inhale calm, exhale tension.",
+    "What simple act of kindness can you offer yourself today?",
+    "Is there a different perspective you haven't considered yet?",
+    "What if this feeling is just a visitor, not a permanent resident?"
+]
+
 class LoopBreakerPromptResource(Resource):
 
     def get(self):
-        prompts = [
-            "What is one small thing you can do right now to shift your focus?",
-            "Identify one thought you're stuck on. Is it truly serving you?",
-            "Close your eyes and focus on five things you can hear.",
-            "If this feeling were a cloud, what shape would it be? Watch it drift.",
-            "Name three things you are grateful for in this exact moment.",
-            "What would a wise friend advise you to do right now?",
-            "Consider your breath. Inhale calm, exhale tension.",
-            "What simple act of kindness can you offer yourself today?",
-            "Is there a different perspective you haven't considered yet?",
-            "What if this feeling is just a visitor, not a permanent resident?"
-        ]
-        return make_response(jsonify({"prompt": choice(prompts)}), 200)
+        return make_response(jsonify({"prompt": choice(LOOP_BREAKER_PROMPTS)}), 200)
 api.add_resource(LoopBreakerPromptResource, '/loop_breaker/prompt')
 
 
+BREATH_GROUND_TECHNIQUES = [
+    {
+        "name": "Box Breathing",
+        "instructions": "Inhale slowly for 4 counts, hold for 4, exhale for 4, hold for 4. Repeat.",
+        "duration": "2-5 minutes"
+    },
+    {
+        "name": "5-4-3-2-1 Grounding",
+        "instructions": "Name 5 things you can see, 4 things you can touch, 3 things you can hear, 2 things you can smell, and 1 thing you can taste.",
+        "duration": "As needed"
+    },
+    {
+        "name": "Deep Belly Breathing",
+        "instructions": "Place one hand on your chest and one on your belly. Breathe deeply so your belly rises, keeping your chest still. Exhale slowly.",
+        "duration": "3-5 minutes"
+    },
+    { 
+        "name": "Mindful Walking",
+        "instructions": "As you walk, bring your awareness to each step: the sensation of your feet on the ground, the movement of your legs, and the rhythm of your breath. If your mind wanders, gently bring it back to your steps.",
+        "duration": "5-10 minutes"
+    },
+    { 
+        "name": "Body Scan Meditation",
+        "instructions": "Lie down or sit comfortably. Bring your attention to different parts of your body, starting from your toes and slowly moving upwards. Notice any sensations without judgment. Breathe into each area.",
+        "duration": "5-15 minutes"
+    },
+    {
+        "name": "Color Visualization",
+        "instructions": "Close your eyes and imagine a calming color (e.g., soft blue or green). Breathe in this color, imagining it filling your body with peace. Breathe out any tension or discomfort as a contrasting color.",
+        "duration": "3-5 minutes"
+    }
+]
+
 class BreathGroundResource(Resource):
     """
     Handles GET for Breath & Ground techniques.
     """
     def get(self):
-        techniques = [
-            {
-                "name": "Box Breathing",
-                "instructions": "Inhale slowly for 4 counts, hold for 4, exhale for 4, hold for 4. Repeat.",
-                "duration": "2-5 minutes"
-            },
-            {
-                "name": "5-4-3-2-1 Grounding",
-                "instructions": "Name 5 things you can see, 4 things you can touch, 3 things you can hear, 2 things you can smell, and 1 thing you can taste.",
-                "duration": "As needed"
-            },
-            {
-                "name": "Deep Belly Breathing",
-                "instructions": "Place one hand on your chest and one on your belly. Breathe deeply so your belly rises, keeping your chest still. Exhale slowly.",
-                "duration": "3-5 minutes"
-            },
-            { 
-                "name": "Mindful Walking",
-                "instructions": "As you walk, bring your awareness to each step: the sensation of your feet on the ground, the movement of your legs, and the rhythm of your breath. If your mind wanders, gently bring it back to your steps.",
-                "duration": "5-10 minutes"
-            },
-            { 
-                "name": "Body Scan Meditation",
-                "instructions": "Lie down or sit comfortably. Bring your attention to different parts of your body, starting from your toes and slowly moving upwards. Notice any sensations without judgment. Breathe into each area.",
-                "duration": "5-15 minutes"
-            },
-            {
-                "name": "Color Visualization",
-                "instructions": "Close your eyes and imagine a calming color (e.g., soft blue or green). Breathe in this color, imagining it filling your body with peace. Breathe out any tension or discomfort as a contrasting color.",
-                "duration": "3-5 minutes"
-            }
-        ]
-        return make_response(jsonify({"techniques": techniques}), 200)
+        return make_response(jsonify({"techniques": BREATH_GROUND_TECHNIQUES}), 200)
 api.add_resource(BreathGroundResource, '/breath_ground')
 
+class ProfilesResource(Resource):
+    """
+    Handles GET for the recent request profiles and compression stats of this worker.
+    Requires an X-Profile-Token header matching PROFILE_TOKEN.
+    """
+    def get(self):
+        if not profiling.authorized(request.headers.get('X-Profile-Token')):
+            return make_response(jsonify({"errors": "Forbidden: You do not have permission to access this resource."}), 403)
+        return make_response(jsonify({
+            "profiles": list(reversed(profiling.PROFILES)),
+            "compression": compression.stats,
+        }), 200)
+api.add_resource(ProfilesResource, '/admin/profiles')
+
+
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+compression = CompressionMiddleware(app.wsgi_app, cacheable_paths=['/breath_ground'])
+app.wsgi_app = compression
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5555))
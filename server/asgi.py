@@ -0,0 +1,454 @@
+"""
+Optional async (ASGI) serving mode, built on Starlette:
+
+    uvicorn asgi:app --port 5555
+
+Serves the same routes, JSON bodies and session cookie as app.py, and runs the
+same validation and queries: the signup/login helpers, the OwnedItems
+collections and the activity and soul note queries in app.py, called through
+AsyncSession.run_sync on aiosqlite. bcrypt and the login limits (a blocking
+SQLite transaction when RATE_LIMIT_DB is set) run in Starlette's threadpool,
+so a request waiting on them or on the database holds no thread.
+
+Around the async routes, the middleware below reproduces what Flask does for
+app.py: CORS headers with Flask-CORS's defaults, the session cookie read and
+written by Flask's own session interface (so SESSION_COOKIE_SECURE, SAMESITE,
+DOMAIN and the lifetime apply), request profiling into profiling.PROFILES and
+compression through app.py's CompressionMiddleware, sharing its cache and
+stats. Requests no async route matches are passed whole to the Flask app in a
+worker thread.
+
+Behind a reverse proxy, run uvicorn with --proxy-headers and
+--forwarded-allow-ips set to the proxies' addresses, so the login limits see
+the client's address rather than the proxy's.
+"""
+import json
+import sys
+from contextlib import asynccontextmanager
+from io import BytesIO
+from random import choice
+
+from flask_cors.core import DEFAULT_OPTIONS as CORS_DEFAULTS
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match, Route
+from werkzeug.wrappers import Response as SessionCarrier
+
+# Local imports
+from config import app as flask_app, DATABASE, DATABASE_BACKEND
+from json_provider import pretty_indent
+from response_compression import MINIMUM_SIZE, compressible, endpoint_name, negotiate
+from rate_limit import login_limits, signup_limits
+from models import User, text_preview
+import profiling
+from app import (
+    ValidationError, compression, signup_fields, login_fields, find_login_user,
+    letters, time_capsules, user_notes, activity_days, random_soul_note,
+    LOOP_BREAKER_PROMPTS, BREATH_GROUND_TECHNIQUES,
+)
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite'}
+
+engine = create_async_engine(make_url(DATABASE).set(drivername=ASYNC_DRIVERS.get(DATABASE_BACKEND, DATABASE_BACKEND)))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@event.listens_for(engine.sync_engine, 'connect')
+def register_sqlite_functions(dbapi_connection, connection_record):
+    if DATABASE_BACKEND == 'sqlite':
+        dbapi_connection.run_async(
+            lambda connection: connection.create_function('text_preview', 2, text_preview, deterministic=True)
+        )
+
+
+def reply(request, payload, status=200, headers=None):
+    """A JSON response encoded like app.py's, including ?pretty=1."""
+    if status == 204 or payload is None:
+        return Response(status_code=status, headers=headers)
+    body = f"{flask_app.json.dumps(payload, indent=pretty_indent(request.query_params))}\n"
+    return Response(body, status, headers, media_type='application/json')
+
+
+def errors(request, message, status):
+    return reply(request, {"errors": message}, status)
+
+
+def too_many_attempts(request, retry_after):
+    return reply(
+        request,
+        {"errors": f"Too many attempts. Please try again in {retry_after} seconds."},
+        429,
+        {'Retry-After': str(retry_after)},
+    )
+
+
+async def json_body(request):
+    body = await request.body()
+    return json.loads(body) if body else None
+
+
+def client_ip(request):
+    return request.client.host if request.client else None
+
+
+async def serialize(session, build):
+    # to_dict() walks relationships; run_sync lets those lazy loads run on the
+    # async connection instead of raising outside the event loop's greenlet.
+    return await session.run_sync(lambda _: build())
+
+
+ROUTES = []
+
+
+def route(method, path, failure, login_required=False):
+    """Registers an async handler; `failure` is the 500 message, as in app.py."""
+    def decorator(handler):
+        async def endpoint(request):
+            if login_required and not request.session.get('user_id'):
+                return errors(request, "Unauthorized: Please log in to access this resource.", 401)
+            async with Session() as session:
+                try:
+                    return await handler(request, session, **request.path_params)
+                except (ValidationError, ValueError) as e:
+                    await session.rollback()
+                    return errors(request, str(e), 400)
+                except Exception as e:
+                    await session.rollback()
+                    if flask_app.debug: print(f"{failure} {e}", file=sys.stderr)
+                    return errors(request, failure, 500)
+
+        ROUTES.append(Route(path, endpoint, methods=[method]))
+        return handler
+    return decorator
+
+
+# --- Auth ---
+
+@route('POST', '/signup', "Failed to create user: An unexpected error occurred.")
+async def signup(request, session):
+    data = await json_body(request)
+
+    retry_after = await run_in_threadpool(signup_limits.retry_after, data.get('email'), client_ip(request))
+    if retry_after:
+        return too_many_attempts(request, retry_after)
+
+    username, email, password = signup_fields(data)
+    new_user = User(username=username, email=email)
+    await run_in_threadpool(setattr, new_user, 'password_hash', password)
+    session.add(new_user)
+    try:
+        await session.commit()
+    except IntegrityError as ie:
+        await session.rollback()
+        message = User.uniqueness_error(ie)
+        if message:
+            return errors(request, message, 400)
+        raise
+
+    request.session['user_id'] = new_user.id
+    return reply(request, await serialize(session, new_user.to_dict), 201)
+
+
+@route('POST', '/login', "Login failed: An unexpected error occurred.")
+async def login(request, session):
+    data = await json_body(request)
+
+    retry_after = await run_in_threadpool(login_limits.retry_after, data.get('identifier'), client_ip(request))
+    if retry_after:
+        return too_many_attempts(request, retry_after)
+
+    identifier, password = login_fields(data)
+    user = await session.run_sync(find_login_user, identifier)
+
+    if not user or not await run_in_threadpool(user.authenticate, password):
+        return errors(request, "Invalid identifier or password.", 401)
+
+    request.session['user_id'] = user.id
+    return reply(request, await serialize(session, user.to_dict))
+
+
+@route('GET', '/check_session', "An internal server error occurred.")
+async def check_session(request, session):
+    user_id = request.session.get('user_id')
+    if not user_id:
+        return errors(request, "No active session.", 401)
+    user = await session.get(User, user_id)
+    if not user:
+        request.session.pop('user_id', None)
+        return errors(request, "User not found.", 401)
+    return reply(request, await serialize(session, user.to_dict))
+
+
+@route('DELETE', '/logout', "An internal server error occurred.")
+async def logout(request, session):
+    request.session.pop('user_id', None)
+    return reply(request, None, 204)
+
+
+# --- Letters, time capsules and user notes ---
+
+def collection_routes(items, path, plural):
+    """Registers list/create/get/update/delete routes for one of app.py's OwnedItems collections."""
+    label = items.label.lower()
+    not_found = f"{items.label} not found or unauthorized."
+
+    @route('GET', path, f"Failed to fetch {plural}.", login_required=True)
+    async def list_items(request, session):
+        return reply(request, await session.run_sync(items.list, request.session['user_id'], request.query_params))
+
+    @route('POST', path, f"Failed to create {label}.", login_required=True)
+    async def create_item(request, session):
+        item = await session.run_sync(items.create, request.session['user_id'], await json_body(request))
+        await session.commit()
+        return reply(request, await serialize(session, item.to_dict), 201)
+
+    @route('GET', f"{path}/{{id:int}}", f"Failed to fetch {label}.", login_required=True)
+    async def get_item(request, session, id):
+        item = await session.run_sync(items.get, id, request.session['user_id'], request.query_params)
+        if not item:
+            return errors(request, not_found, 404)
+        return reply(request, item)
+
+    @route('PATCH', f"{path}/{{id:int}}", f"Failed to update {label}.", login_required=True)
+    async def update_item(request, session, id):
+        item = await session.run_sync(items.update, id, request.session['user_id'], await json_body(request))
+        if not item:
+            return errors(request, not_found, 404)
+        await session.commit()
+        return reply(request, await serialize(session, item.to_dict))
+
+    @route('DELETE', f"{path}/{{id:int}}", f"Failed to delete {label}.", login_required=True)
+    async def delete_item(request, session, id):
+        item = await session.run_sync(items.delete, id, request.session['user_id'])
+        if not item:
+            return errors(request, not_found, 404)
+        await session.commit()
+        return reply(request, None, 204)
+
+
+collection_routes(letters, '/letters', "letters")
+collection_routes(time_capsules, '/time_capsules', "time capsules")
+collection_routes(user_notes, '/user_notes', "user notes")
+
+
+@route('GET', '/me/activity', "Failed to fetch activity.", login_required=True)
+async def activity(request, session):
+    return reply(request, await session.run_sync(activity_days, request.session['user_id'], request.query_params))
+
+
+# --- Soul notes, loop breaker, breath & ground ---
+
+@route('GET', '/soul_notes/random', "Failed to retrieve soul note.")
+async def soul_note(request, session):
+    payload, status = await session.run_sync(random_soul_note)
+    return reply(request, payload, status)
+
+
+@route('GET', '/loop_breaker/prompt', "An internal server error occurred.")
+async def loop_breaker_prompt(request, session):
+    return reply(request, {"prompt": choice(LOOP_BREAKER_PROMPTS)})
+
+
+@route('GET', '/breath_ground', "An internal server error occurred.")
+async def breath_ground(request, session):
+    return reply(request, {"techniques": BREATH_GROUND_TECHNIQUES})
+
+
+# --- Middleware ---
+
+class FlaskSession:
+    """
+    Opens Flask's signed session cookie into scope['session'] (request.session)
+    and saves it with Flask's session interface, so both modes share logins and
+    the cookie carries the SESSION_COOKIE_* attributes and Vary: Cookie.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.interface = flask_app.session_interface
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        session = self.interface.open_session(flask_app, Request(scope))
+        scope['session'] = session
+
+        async def send_with_session(message):
+            if message['type'] == 'http.response.start':
+                carrier = SessionCarrier()
+                self.interface.save_session(flask_app, session, carrier)
+                headers = MutableHeaders(scope=message)
+                for cookie in carrier.headers.getlist('Set-Cookie'):
+                    headers.append('Set-Cookie', cookie)
+                if carrier.vary:
+                    headers.add_vary_header(carrier.headers['Vary'])
+            await send(message)
+
+        await self.app(scope, receive, send_with_session)
+
+
+class Compression:
+    """
+    Compresses async responses through app.py's CompressionMiddleware, so
+    both modes share its cache and its per-endpoint stats.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        method = scope['method']
+        encoder = None if method == 'HEAD' else negotiate(Headers(scope=scope).get('accept-encoding'))
+        started = {}
+        chunks = []
+
+        async def send_compressed(message):
+            if message['type'] == 'http.response.start':
+                started.update(message)
+                return
+            chunks.append(message.get('body', b''))
+            if message.get('more_body'):
+                return
+
+            body = b''.join(chunks)
+            headers = MutableHeaders(scope=started)
+            if started['status'] not in (204, 206, 304) and compressible({name: value for name, value in headers.items()}):
+                headers.add_vary_header('Accept-Encoding')
+                if encoder and len(body) >= MINIMUM_SIZE:
+                    path = scope['path']
+                    body = await run_in_threadpool(compression.compress_body, method, path, body, encoder, endpoint_name(path))
+                    headers['Content-Encoding'] = encoder.name
+                    headers['Content-Length'] = str(len(body))
+            await send(started)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class Profiling:
+    """Profiles async requests with the same triggers and PROFILES buffer as app.py's hooks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        profile = profiling.begin(Headers(scope=scope).get('x-profile')) if scope['type'] == 'http' else None
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+        status = []
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            query = scope['query_string'].decode('latin-1')
+            path = f"{scope['path']}?{query}" if query else scope['path']
+            profiling.end(profile, scope['method'], path, status[0] if status else None)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+api = Starlette(
+    routes=ROUTES,
+    middleware=[
+        # CORS(app) in config.py: any origin, echoed back with Vary: Origin.
+        Middleware(CORSMiddleware, allow_origin_regex='.*', allow_methods=CORS_DEFAULTS['methods'], allow_headers=['*']),
+        Middleware(FlaskSession),
+        Middleware(Compression),
+        Middleware(Profiling),
+    ],
+    lifespan=lifespan,
+)
+
+
+# --- Flask fallback ---
+
+def call_flask(scope, body):
+    """Runs a request through the Flask app (WSGI) and collects its response."""
+    headers = Headers(scope=scope)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('',))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'CONTENT_TYPE': headers.get('content-type', ''),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        if name not in ('content-type', 'content-length'):
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    response = flask_app.wsgi_app(environ, start_response)
+    try:
+        content = b''.join(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return started['status'], [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in started['headers']], content
+
+
+class FlaskFallback:
+    """
+    Passes requests that no async route fully matches (e.g. /, the client
+    build, /admin/profiles, or GET /login) to the Flask app, which applies its
+    own CORS, session, profiling and compression.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or any(route.matches(scope)[0] == Match.FULL for route in self.app.routes):
+            await self.app(scope, receive, send)
+            return
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        status, headers, body = await run_in_threadpool(call_flask, scope, b''.join(chunks))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = FlaskFallback(api)
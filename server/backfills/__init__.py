@@ -0,0 +1,17 @@
+"""
+Resumable background backfills for large tables.
+
+Alembic batch mode on SQLite rebuilds the whole table while holding the write
+lock, so data changes to big tables are split in two: a migration that only
+adds nullable columns or indexes (plain ALTER TABLE / CREATE INDEX, no copy),
+then a backfill registered here that fills the data in in short,
+keyset-ordered transactions. Run from the server directory:
+
+    python -m backfills status
+    python -m backfills run <name>
+    python -m backfills reset <name>
+"""
+from backfills.base import BACKFILLS, Backfill, register, run
+
+# Import modules that register backfills.
+import backfills.compression  # noqa: E402,F401
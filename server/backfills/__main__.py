@@ -0,0 +1,37 @@
+import sys
+
+from config import app, db
+from models import BackfillProgress
+from backfills import BACKFILLS, run
+
+USAGE = "usage: python -m backfills status | run <name> | reset <name>"
+
+
+def status():
+    for name in sorted(BACKFILLS):
+        progress = db.session.get(BackfillProgress, name)
+        if progress is None:
+            state = "not started"
+        elif progress.finished_at:
+            state = f"finished {progress.finished_at:%Y-%m-%d %H:%M:%S}, {progress.rows_processed} rows"
+        else:
+            state = f"in progress, {progress.rows_processed} rows through key {progress.last_key}"
+        print(f"{name}: {state}")
+
+
+if __name__ == '__main__':
+    command, names = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else (None, [])
+    unknown = [name for name in names if name not in BACKFILLS]
+    if command not in ('status', 'run', 'reset') or (command != 'status' and not names) or unknown:
+        sys.exit(USAGE + (f"\nunknown backfills: {', '.join(unknown)}" if unknown else ""))
+
+    with app.app_context():
+        if command == 'status':
+            status()
+        for name in names:
+            if command == 'run':
+                run(BACKFILLS[name])
+            else:
+                BackfillProgress.query.filter_by(name=name).delete()
+                db.session.commit()
+                print(f"{name}: checkpoint cleared.")
@@ -0,0 +1,126 @@
+import os
+from datetime import datetime
+from time import perf_counter, sleep
+
+from sqlalchemy import select
+
+from config import db
+from models import BackfillProgress
+
+# Every chunk runs in its own transaction, and on SQLite a request that writes
+# waits for that transaction to commit. Keeping each chunk under the budget
+# bounds the extra latency a backfill can add to any request.
+LATENCY_BUDGET_MS = float(os.environ.get('BACKFILL_LATENCY_BUDGET_MS', 50))
+# Fraction of wall-clock time spent inside chunk transactions; the rest is
+# left idle for request traffic.
+DUTY_CYCLE = float(os.environ.get('BACKFILL_DUTY_CYCLE', 0.5))
+
+BACKFILLS = {}
+
+
+def register(backfill_class):
+    BACKFILLS[backfill_class.name] = backfill_class()
+    return backfill_class
+
+
+class Backfill:
+    """
+    One resumable pass over `model` in primary-key order.
+
+    Subclasses set `name` and `model`, list the `columns` each row needs
+    besides its key, narrow the rows with `where()` and rewrite a chunk in
+    `process()`. `process()` must be idempotent per row: a crash between
+    chunks is resumed from the last committed key.
+
+    Chunks are key ranges, not row counts. `where()` filters usually have no
+    index, so LIMIT would only cap the rows that match, and a chunk over a
+    stretch with no matches could scan to the end of the table in one read
+    transaction. A range of `span` keys scans at most `span` rows.
+    """
+    name = None
+    model = None
+    columns = ()
+    initial_span = 500
+    max_span = 50000
+
+    def where(self):
+        return []
+
+    def process(self, rows):
+        raise NotImplementedError
+
+    def chunk(self, after_key, through_key):
+        """The rows with keys in (after_key, through_key] that `where()` selects."""
+        key = self.model.id
+        return db.session.execute(
+            select(key, *self.columns)
+            .where(key > after_key, key <= through_key, *self.where())
+            .order_by(key)
+        ).all()
+
+    def end_key(self):
+        """The highest key in the table: one index seek, unlike COUNT(*), which would read every row."""
+        return db.session.execute(select(db.func.max(self.model.id))).scalar() or 0
+
+
+def run(backfill, report=print):
+    """
+    Runs `backfill` to completion from its last checkpoint.
+
+    Each chunk and its checkpoint commit together, so a chunk is either fully
+    applied and recorded or not at all. The checkpoint moves to the end of each
+    key range even when no rows in it matched, and the run finishes once it
+    passes the highest key present at the start; the app must already write
+    rows added after that in the new form. The span adapts so a transaction
+    takes about half the latency budget, and the runner sleeps between chunks
+    to hold the duty cycle.
+    """
+    progress = db.session.get(BackfillProgress, backfill.name)
+    if progress is None:
+        progress = BackfillProgress(name=backfill.name, last_key=0, rows_processed=0)
+        db.session.add(progress)
+        db.session.commit()
+    if progress.finished_at:
+        report(f"{backfill.name}: already finished ({progress.rows_processed} rows).")
+        return progress
+
+    # Progress is estimated in keys rather than counted in rows; an exact count
+    # on a large table is a long read that blocks writers on SQLite.
+    end_key = backfill.end_key()
+    first_key = progress.last_key
+    db.session.commit()
+    budget = LATENCY_BUDGET_MS / 1000
+    span = backfill.initial_span
+    run_started = perf_counter()
+
+    while progress.last_key < end_key:
+        started = perf_counter()
+        through_key = min(progress.last_key + span, end_key)
+        rows = backfill.chunk(progress.last_key, through_key)
+        if rows:
+            backfill.process(rows)
+            progress.rows_processed += len(rows)
+        progress.last_key = through_key
+        progress.updated_at = datetime.utcnow()
+        db.session.commit()
+        elapsed = perf_counter() - started
+
+        key_rate = (progress.last_key - first_key) / (perf_counter() - run_started)
+        keys_left = end_key - progress.last_key
+        report(
+            f"{backfill.name}: {progress.rows_processed} rows "
+            f"(through key {progress.last_key} of {end_key}, {len(rows)} rows in {elapsed * 1000:.0f} ms, "
+            f"~{keys_left / key_rate if key_rate else 0:.0f}s left)"
+        )
+
+        if elapsed > budget:
+            span = max(1, span // 2)
+        elif elapsed < budget / 2:
+            span = min(backfill.max_span, span * 2)
+        sleep(elapsed * (1 - DUTY_CYCLE) / DUTY_CYCLE)
+
+    progress.finished_at = datetime.utcnow()
+    progress.updated_at = progress.finished_at
+    db.session.commit()
+    report(f"{backfill.name}: finished, {progress.rows_processed} rows.")
+    return progress
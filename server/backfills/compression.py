@@ -0,0 +1,54 @@
+from sqlalchemy import bindparam, update
+
+from config import db
+from models import Letter, TimeCapsule, UserNote, COMPRESSION_THRESHOLD
+from backfills.base import Backfill, register
+
+
+class CompressBodies(Backfill):
+    """Rewrites plain TEXT bodies at or above the threshold so CompressedText stores them compressed."""
+    column_name = None
+
+    @property
+    def column(self):
+        return getattr(self.model, self.column_name)
+
+    @property
+    def columns(self):
+        return (self.column,)
+
+    def where(self):
+        return [
+            db.func.typeof(self.column) == 'text',
+            db.func.length(db.cast(self.column, db.LargeBinary)) >= COMPRESSION_THRESHOLD,
+        ]
+
+    def process(self, rows):
+        table = self.model.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('row_id'))
+            .values({self.column.key: bindparam('body')}),
+            [{'row_id': row_id, 'body': body} for row_id, body in rows],
+        )
+
+
+@register
+class CompressLetterContent(CompressBodies):
+    name = 'compress_letter_content'
+    model = Letter
+    column_name = 'content'
+
+
+@register
+class CompressUserNoteContent(CompressBodies):
+    name = 'compress_user_note_content'
+    model = UserNote
+    column_name = 'content'
+
+
+@register
+class CompressTimeCapsuleMessage(CompressBodies):
+    name = 'compress_time_capsule_message'
+    model = TimeCapsule
+    column_name = 'message'
@@ -0,0 +1,57 @@
+"""
+Serves the production build of the React client (`npm run build` in client/).
+
+Files whose names carry a content hash (CRA emits e.g. main.1a2b3c4d.js) never
+change under the same URL, so they are cached for a year as immutable.
+Everything else, index.html above all, must be revalidated so a deploy is
+picked up at once. When the build step has left .br or .gz siblings next to a
+file, the one the client accepts is sent as is; a file without a matching
+sibling is sent uncompressed rather than compressed on every request. Files
+are sent by path, so a WSGI server that provides wsgi.file_wrapper (gunicorn)
+can hand them to sendfile().
+"""
+import mimetypes
+import os
+import re
+
+from flask import send_file
+from werkzeug.security import safe_join
+
+from config import CLIENT_BUILD_DIR
+from response_compression import accepts, encoding_weights
+
+HASHED_ASSET = re.compile(r'\.[0-9a-f]{8,}(\.chunk)?\.[a-z0-9]+$')
+# no-transform keeps CompressionMiddleware (and proxies) from re-encoding the
+# file, so the body stays a sendfile() of the file on disk.
+IMMUTABLE = 'public, max-age=31536000, immutable, no-transform'
+REVALIDATE = 'no-cache, no-transform'
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')]
+
+
+def client_index():
+    """Path of the built index.html, or None when the client has not been built."""
+    index = os.path.join(CLIENT_BUILD_DIR, 'index.html')
+    return index if os.path.isfile(index) else None
+
+
+def client_file(url_path):
+    """The built file for `url_path`, or None when there is no such file."""
+    path = safe_join(CLIENT_BUILD_DIR, url_path.lstrip('/'))
+    return path if path and os.path.isfile(path) else None
+
+
+def send_client_file(path, accept_encoding):
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    weights = encoding_weights(accept_encoding)
+    served, encoding = path, None
+    for coding, suffix in PRECOMPRESSED:
+        if accepts(weights, coding) and os.path.isfile(path + suffix):
+            served, encoding = path + suffix, coding
+            break
+
+    response = send_file(served, mimetype=mimetype, conditional=True, etag=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE if HASHED_ASSET.search(path) else REVALIDATE
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,80 @@
+import sys
+from time import perf_counter
+
+from sqlalchemy import select
+
+# Local imports
+from config import app, db
+from backfills import BACKFILLS, run
+
+COMPRESSION_BACKFILLS = [
+    BACKFILLS['compress_letter_content'],
+    BACKFILLS['compress_user_note_content'],
+    BACKFILLS['compress_time_capsule_message'],
+]
+
+# Before/after sizes and read times are measured on SAMPLE_WINDOWS runs of
+# SAMPLE_ROWS rows spread across the key range, each read in its own short
+# transaction, so measuring never holds a long read lock on a large table.
+SAMPLE_WINDOWS = 20
+SAMPLE_ROWS = 100
+
+
+def sample_starts(model):
+    low, high = db.session.execute(select(db.func.min(model.id), db.func.max(model.id))).one()
+    db.session.commit()
+    if low is None:
+        return []
+    step = max((high - low) // SAMPLE_WINDOWS, 1)
+    return list(range(low, high + 1, step))[:SAMPLE_WINDOWS]
+
+
+def measure_sample(model, column, starts):
+    """(rows, stored bytes, read seconds) over the sample windows."""
+    rows = stored = 0
+    seconds = 0.0
+    for start in starts:
+        started = perf_counter()
+        window = db.session.execute(
+            select(column, db.func.length(db.cast(column, db.LargeBinary)))
+            .where(model.id >= start).order_by(model.id).limit(SAMPLE_ROWS)
+        ).all()
+        seconds += perf_counter() - started
+        stored += sum(length or 0 for _, length in window)
+        rows += len(window)
+        db.session.commit()
+    return rows, stored, seconds
+
+
+def database_bytes():
+    page_size = db.session.execute(db.text('PRAGMA page_size')).scalar()
+    page_count = db.session.execute(db.text('PRAGMA page_count')).scalar()
+    freelist_count = db.session.execute(db.text('PRAGMA freelist_count')).scalar()
+    return page_size * (page_count - freelist_count)
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            sys.exit("Body compression is only supported on SQLite.")
+
+        database_before = database_bytes()
+        for backfill in COMPRESSION_BACKFILLS:
+            model, column = backfill.model, backfill.column
+            name = f"{model.__tablename__}.{column.key}"
+            starts = sample_starts(model)
+            rows, bytes_before, seconds_before = measure_sample(model, column, starts)
+
+            print(f"Compressing {name}...")
+            progress = run(backfill)
+
+            _, bytes_after, seconds_after = measure_sample(model, column, starts)
+            print(
+                f"{name}: {progress.rows_processed} rows processed; "
+                f"sample of {rows} rows: {bytes_before} -> {bytes_after} bytes stored, "
+                f"read {seconds_before * 1000:.1f} -> {seconds_after * 1000:.1f} ms"
+            )
+
+        database_after = database_bytes()
+        print(f"Database pages in use: {database_before} -> {database_after} bytes.")
+        print("Run VACUUM during a quiet period to return freed pages to the filesystem.")
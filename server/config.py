@@ -8,18 +8,30 @@ from flask_migrate import Migrate
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
+from sqlalchemy.engine import make_url
 from flask_bcrypt import Bcrypt
 
+# Local imports
+from json_provider import FastJSONProvider, output_json
+
 app = Flask(__name__)
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATABASE = os.environ.get(
     "DB_URI", f"sqlite:///{os.path.join(BASE_DIR, 'instance', 'app.db')}"
 )
+DATABASE_BACKEND = make_url(DATABASE).get_backend_name()
+CLIENT_BUILD_DIR = os.environ.get(
+    "CLIENT_BUILD_DIR", os.path.join(BASE_DIR, '..', 'client', 'build')
+)
+# Number of reverse proxies in front of the app. When set, the client address
+# (request.remote_addr, used by the login limits) is taken from
+# X-Forwarded-For instead of being the nearest proxy's address.
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-app.json.compact = False 
+app.json = FastJSONProvider(app)
 
 app.secret_key = os.environ.get('SECRET_KEY', 'a_very_secret_key_for_dev_only_change_this_later')
 
@@ -36,6 +48,7 @@ migrate = Migrate(app, db)
 db.init_app(app)
 
 api = Api(app)
+api.representations['application/json'] = output_json
 
 CORS(app)
 
@@ -0,0 +1,44 @@
+# Gunicorn settings for `gunicorn -c gunicorn.conf.py wsgi:app`.
+# Every value can be overridden from the environment or the command line.
+import os
+
+from config import app, db
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5555)}")
+
+# Requests are dominated by bcrypt and SQLite, both CPU-bound, so size to the
+# CPUs this process may actually run on (which respects container limits).
+# sched_getaffinity is Linux-only; elsewhere fall back to the machine's CPU count.
+def default_workers():
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    return cpus * 2 + 1
+
+
+workers = int(os.environ.get('WEB_CONCURRENCY') or default_workers())
+
+# Import the app once in the master so workers share its pages copy-on-write
+# and start instantly. Code changes then need a new master: send USR2 to start
+# one alongside the old, then QUIT the old master (HUP only restarts workers
+# on the already-imported code).
+preload_app = True
+
+# Recycle each worker after a jittered number of requests to cap slow leaks
+# without restarting every worker at once.
+max_requests = int(os.environ.get('MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 100))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared with the children.
+    # close=False drops the inherited pool without closing the parent's
+    # connections underneath it; each worker then opens its own.
+    with app.app_context():
+        db.engine.dispose(close=False)
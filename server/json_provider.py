@@ -0,0 +1,60 @@
+import json
+from datetime import date
+
+from flask import current_app, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder.
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Compact JSON for every response, encoded with orjson when it is installed.
+
+    Dates and datetimes are written as ISO 8601 by both encoders (Flask's
+    default would format them as HTTP dates). Pretty-printing is opt-in per
+    request with ?pretty=1.
+    """
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and set(kwargs) <= {'indent'}:
+            option = orjson.OPT_NON_STR_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        if not kwargs.get('indent'):
+            kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(f"{self.dumps(obj, indent=pretty_indent())}\n", mimetype=self.mimetype)
+
+
+def pretty_indent(args=None):
+    """2 when the request asked for ?pretty=1, else None."""
+    if args is None:
+        args = request.args if has_request_context() else {}
+    return 2 if args.get('pretty') in ('1', 'true') else None
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful representation that renders through the app's JSON provider."""
+    response = current_app.json.response(data)
+    response.status_code = code
+    response.headers.extend(headers or {})
+    return response
@@ -0,0 +1,27 @@
+"""add case-insensitive user indexes
+
+Revision ID: c41e9b2d6f13
+Revises: 8f2c1d7a4b90
+Create Date: 2026-10-19 11:40:27.905316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e9b2d6f13'
+down_revision = '8f2c1d7a4b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fails if existing users differ only by case; merge those accounts first.
+    op.create_index('uq_users_username_ci', 'users', [sa.text('lower(username)')], unique=True)
+    op.create_index('uq_users_email_ci', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_users_email_ci', table_name='users')
+    op.drop_index('uq_users_username_ci', table_name='users')
@@ -1,9 +1,16 @@
 from datetime import datetime
 import re 
+import sqlite3
+import zlib
 
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
 from flask_bcrypt import Bcrypt
 
 from config import db
@@ -11,6 +18,94 @@ from config import db
 
 bcrypt = Bcrypt() 
 
+# Bodies shorter than this are stored as plain TEXT; compressing them costs more
+# than it saves once the zlib header and checksum are added.
+COMPRESSION_THRESHOLD = 512
+
+# Shared preset dictionary for zlib. Letters, notes and capsules are short
+# first-person prose, so seeding the window with the phrases they have in common
+# lets even a few hundred bytes compress well. Never edit an existing entry:
+# stored rows name the dictionary version they were compressed with.
+COMPRESSION_DICTIONARIES = {
+    1: (
+        "sometimes I wonder whether it would have been different if I had "
+        "I don't know how to say this but I need to let it out "
+        "today I felt so tired and anxious and overwhelmed and alone "
+        "I am grateful for the small things, for the people who love me "
+        "I miss you and I think about you every day, I wish I could tell you "
+        "dear future me, I hope you are happy and kind to yourself "
+        "I remember when we used to talk for hours about everything "
+        "I'm sorry that I never told you how much it meant to me "
+        "I want to be better, I want to feel calm, I need to breathe "
+        "my mind keeps going back to the same thoughts again and again "
+        "thank you for being there when I needed someone the most "
+        "I feel like nobody understands what I am going through right now "
+        "I am proud of myself for getting through this week "
+        "when I woke up this morning I realized that I have been "
+        "because I was afraid of what would happen if I said something "
+        "and I still think about it, even though it was a long time ago "
+        "I love you. I forgive you. I forgive myself. I am trying. "
+    ).encode('utf-8'),
+}
+CURRENT_COMPRESSION_DICTIONARY = 1
+
+
+def compress_text(text):
+    version = CURRENT_COMPRESSION_DICTIONARY
+    compressor = zlib.compressobj(level=6, zdict=COMPRESSION_DICTIONARIES[version])
+    return bytes([version]) + compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+
+def decompress_text(data):
+    decompressor = zlib.decompressobj(zdict=COMPRESSION_DICTIONARIES[data[0]])
+    return (decompressor.decompress(data[1:]) + decompressor.flush()).decode('utf-8')
+
+
+def text_preview(value, length):
+    """First `length` characters of a stored body, inflating only as much of a
+    compressed value as those characters can occupy."""
+    if value is None or isinstance(value, str):
+        return value if value is None else value[:length]
+    decompressor = zlib.decompressobj(zdict=COMPRESSION_DICTIONARIES[value[0]])
+    head = decompressor.decompress(value[1:], length * 4)
+    return head.decode('utf-8', 'ignore')[:length]
+
+
+@event.listens_for(Engine, 'connect')
+def register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('text_preview', 2, text_preview, deterministic=True)
+
+
+class CompressedText(db.TypeDecorator):
+    """Text column that stores long values zlib-compressed.
+
+    Values at or above COMPRESSION_THRESHOLD bytes are written as a BLOB whose
+    first byte names the preset dictionary; shorter values and rows written
+    before compression existed stay plain TEXT. Reads hand back a str either
+    way, so validators and to_dict() never see the difference. SQLite is the
+    only backend that lets TEXT and BLOB share a column, so other dialects
+    store every value uncompressed.
+    """
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        # Non-string values (e.g. a JSON number) are stored as given, as before.
+        if not isinstance(value, str) or dialect.name != 'sqlite':
+            return value
+        encoded_length = len(value.encode('utf-8'))
+        if encoded_length < COMPRESSION_THRESHOLD:
+            return value
+        compressed = compress_text(value)
+        return compressed if len(compressed) < encoded_length else value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, bytes):
+            return decompress_text(value)
+        return value
+
+
 class User(db.Model, SerializerMixin):
     __tablename__ = 'users'
 
@@ -20,6 +115,13 @@ class User(db.Model, SerializerMixin):
     _password_hash = db.Column(db.String, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Case-insensitive uniqueness lives in the database so concurrent signups
+    # cannot race past it; Login.post looks users up through the same indexes.
+    __table_args__ = (
+        db.Index('uq_users_username_ci', db.func.lower(username), unique=True),
+        db.Index('uq_users_email_ci', db.func.lower(email), unique=True),
+    )
+
     letters = db.relationship('Letter', backref='user', lazy=True, cascade='all, delete-orphan')
     time_capsules = db.relationship('TimeCapsule', backref='user', lazy=True, cascade='all, delete-orphan')
     user_notes = db.relationship('UserNote', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -48,10 +150,6 @@ class User(db.Model, SerializerMixin):
     def validate_email(self, key, email):
         if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
             raise ValueError("Invalid email format.")
-        
-        existing_user = User.query.filter(db.func.lower(User.email) == db.func.lower(email)).first()
-        if existing_user and existing_user.id != self.id:
-            raise ValueError("Email already in use.")
         return email
 
     @db.validates('username')
@@ -60,21 +158,44 @@ class User(db.Model, SerializerMixin):
             raise ValueError("Username cannot be empty.")
         if len(username) < 3 or len(username) > 80:
             raise ValueError("Username must be between 3 and 80 characters.")
-        existing_user = User.query.filter(db.func.lower(User.username) == db.func.lower(username)).first()
-        if existing_user and existing_user.id != self.id:
-            raise ValueError("Username already taken.")
         return username
 
+    # Index or constraint names a unique violation reports for each column: the
+    # case-insensitive index, the column's own UNIQUE (SQLite names it as
+    # table.column) and PostgreSQL's default constraint name.
+    UNIQUENESS_ERRORS = (
+        (('uq_users_email_ci', 'users.email', 'users_email_key'), "Email already in use."),
+        (('uq_users_username_ci', 'users.username', 'users_username_key'), "Username already taken."),
+    )
+
+    @classmethod
+    def uniqueness_error(cls, integrity_error):
+        """Message for an IntegrityError raised by one of the users uniqueness indexes, else None."""
+        detail = str(integrity_error.orig)
+        if 'unique' not in detail.lower():
+            return None
+        for names, message in cls.UNIQUENESS_ERRORS:
+            if any(re.search(rf"(?<![\w.]){re.escape(name)}(?![\w.])", detail) for name in names):
+                return message
+        return None
+
 class Letter(db.Model, SerializerMixin):
     __tablename__ = 'letters'
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(255), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(CompressedText, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    serialize_rules = ('-user.letters',)
+    # Serves both the per-user listing (newest first) and the user.letters load.
+    __table_args__ = (
+        db.Index('ix_letters_user_id_created_at', user_id, created_at),
+    )
+
+    preview = db.query_expression()
+
+    serialize_rules = ('-user.letters', '-preview',)
 
     def __repr__(self):
         return f'<Letter {self.title}>'
@@ -96,11 +217,17 @@ class TimeCapsule(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    message = db.Column(db.Text, nullable=False)
+    message = db.Column(CompressedText, nullable=False)
     open_date = db.Column(db.DateTime, nullable=False) # Date when the capsule can be opened
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    serialize_rules = ('-user.time_capsules',)
+    __table_args__ = (
+        db.Index('ix_time_capsules_user_id_open_date', user_id, open_date),
+    )
+
+    preview = db.query_expression()
+
+    serialize_rules = ('-user.time_capsules', '-preview',)
 
     def __repr__(self):
         return f'<TimeCapsule {self.id} - Open on {self.open_date.strftime("%Y-%m-%d")}>'
@@ -122,10 +249,16 @@ class UserNote(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(CompressedText, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    serialize_rules = ('-user.user_notes',)
+    __table_args__ = (
+        db.Index('ix_user_notes_user_id_created_at', user_id, created_at),
+    )
+
+    preview = db.query_expression()
+
+    serialize_rules = ('-user.user_notes', '-preview',)
 
     def __repr__(self):
         return f'<UserNote {self.id}>'
@@ -152,3 +285,92 @@ class SoulNote(db.Model, SerializerMixin):
             raise ValueError("Message must be non-empty and less than 500 characters.")
         return message
 
+
+class UserDailyActivity(db.Model, SerializerMixin):
+    """
+    Per-user, per-day counts of letters, notes and capsules written, keyed by
+    the UTC date of each item's created_at. Kept current by the create and
+    delete paths in app.py; rebuild_activity.py recomputes it from scratch.
+    """
+    __tablename__ = 'user_daily_activity'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    letter_count = db.Column(db.Integer, nullable=False, default=0)
+    note_count = db.Column(db.Integer, nullable=False, default=0)
+    capsule_count = db.Column(db.Integer, nullable=False, default=0)
+
+    serialize_only = ('day', 'letter_count', 'note_count', 'capsule_count')
+
+    COUNT_COLUMNS = {
+        'letters': 'letter_count',
+        'user_notes': 'note_count',
+        'time_capsules': 'capsule_count',
+    }
+
+    def __repr__(self):
+        return f'<UserDailyActivity {self.user_id} {self.day}>'
+
+    # Dialects with INSERT ... ON CONFLICT DO UPDATE; others take the UPDATE-then-INSERT path in record().
+    UPSERT_INSERTS = {
+        'sqlite': sqlite_insert,
+        'postgresql': postgresql_insert,
+    }
+
+    @classmethod
+    def upsert(cls, item, delta, dialect_name):
+        """
+        Single statement adding `delta` to the count for `item`'s user and day.
+        None when `item` has no created_at or the dialect has no ON CONFLICT.
+        """
+        insert = cls.UPSERT_INSERTS.get(dialect_name)
+        if item.created_at is None or insert is None:
+            return None
+        column = cls.COUNT_COLUMNS[item.__tablename__]
+        return insert(cls).values(
+            user_id=item.user_id,
+            day=item.created_at.date(),
+            **{column: max(delta, 0)},
+        ).on_conflict_do_update(
+            index_elements=['user_id', 'day'],
+            set_={column: getattr(cls, column) + delta},
+        )
+
+    @classmethod
+    def record(cls, item, delta, session=None):
+        """Adds `delta` to the count for `item`'s user and day in `session`'s (default db.session) transaction."""
+        if item.created_at is None:
+            return
+        session = session or db.session
+        statement = cls.upsert(item, delta, session.get_bind().dialect.name)
+        if statement is not None:
+            session.execute(statement)
+            return
+
+        column = cls.COUNT_COLUMNS[item.__tablename__]
+        day = item.created_at.date()
+        increment = db.update(cls).where(cls.user_id == item.user_id, cls.day == day).values(
+            {column: getattr(cls, column) + delta}
+        )
+        if session.execute(increment).rowcount:
+            return
+        try:
+            # The savepoint lets a concurrent insert of the same row lose without aborting the transaction.
+            with session.begin_nested():
+                session.execute(db.insert(cls).values(user_id=item.user_id, day=day, **{column: max(delta, 0)}))
+        except IntegrityError:
+            session.execute(increment)
+
+class BackfillProgress(db.Model, SerializerMixin):
+    """Checkpoint for one backfill in server/backfills: the last primary key it has committed."""
+    __tablename__ = 'backfill_progress'
+
+    name = db.Column(db.String(100), primary_key=True)
+    last_key = db.Column(db.Integer, nullable=False, default=0)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<BackfillProgress {self.name} at {self.last_key}>'
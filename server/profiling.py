@@ -0,0 +1,167 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>`, or at
+random with probability PROFILE_SAMPLE_RATE. A profiled request runs under
+cProfile and has each of its SQL statements timed. The slowest functions and
+statements are kept in PROFILES, a ring buffer of the last PROFILE_BUFFER
+requests. Each worker process keeps its own buffer.
+
+begin() and end() work on any request; start(), finish() and discard() are
+the Flask hooks around them, and asgi.py calls them from its middleware. The
+request being profiled is tracked in a context variable, so SQL is attributed
+to the right request in threads and asyncio tasks alike. In async mode
+cProfile sees the whole event loop thread, so while a request is profiled its
+function list also includes other requests' work between its awaits.
+
+When a request is not profiled, the cost is one header lookup, one random()
+call, and a counter check in the SQL event listeners.
+"""
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from time import perf_counter
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_BUFFER = int(os.environ.get('PROFILE_BUFFER', 50))
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', 15))
+STATEMENT_LENGTH = 300
+
+PROFILES = deque(maxlen=PROFILE_BUFFER)
+
+# Number of requests being profiled right now, so the SQL listeners can
+# return at once in the common case.
+active = 0
+active_lock = threading.Lock()
+current = ContextVar('profile', default=None)
+
+
+def authorized(token):
+    """Whether `token` matches PROFILE_TOKEN. Always False when no token is configured."""
+    return bool(PROFILE_TOKEN and token) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def begin(token):
+    """
+    Starts profiling the current request if `token` (its X-Profile header)
+    asks for it or it was sampled. Returns the profile, or None.
+    """
+    global active
+    if authorized(token):
+        trigger = 'header'
+    elif PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        trigger = 'sample'
+    else:
+        return None
+
+    with active_lock:
+        active += 1
+    profile = {
+        'trigger': trigger,
+        'started_at': datetime.now(timezone.utc),
+        'started': perf_counter(),
+        'sql': [],
+        'profiler': cProfile.Profile(),
+    }
+    try:
+        profile['profiler'].enable()
+    except ValueError:
+        # Another profiler is already running on this thread.
+        profile['profiler'] = None
+    current.set(profile)
+    return profile
+
+
+def end(profile, method, path, status):
+    """Stops `profile` and records its summary in PROFILES."""
+    global active
+    current.set(None)
+    duration = perf_counter() - profile['started']
+    profiler = profile['profiler']
+    if profiler is not None:
+        profiler.disable()
+    with active_lock:
+        active -= 1
+
+    statements = profile['sql']
+    PROFILES.append({
+        'method': method,
+        'path': path,
+        'status': status,
+        'trigger': profile['trigger'],
+        'started_at': profile['started_at'],
+        'duration_ms': round(duration * 1000, 3),
+        'functions': top_functions(profiler) if profiler is not None else [],
+        'sql': {
+            'count': len(statements),
+            'total_ms': round(sum(ms for _, ms in statements), 3),
+            'slowest': [
+                {'statement': statement, 'ms': round(ms, 3)}
+                for statement, ms in sorted(statements, key=lambda item: item[1], reverse=True)[:PROFILE_TOP_N]
+            ],
+        },
+    })
+
+
+def start():
+    """Starts profiling the current Flask request if it asked to be profiled or was sampled."""
+    begin(request.headers.get('X-Profile'))
+
+
+def finish(response=None):
+    """Stops profiling the current Flask request and records its summary in PROFILES."""
+    profile = current.get()
+    if profile is not None:
+        end(profile, request.method, request.full_path.rstrip('?'), response.status_code if response is not None else None)
+    return response
+
+
+def discard(exc=None):
+    """Ends profiling for a request that raised before finish() could run."""
+    finish()
+
+
+def top_functions(profiler):
+    """The PROFILE_TOP_N functions with the most cumulative time."""
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in pstats.Stats(profiler).stats.items():
+        rows.append({
+            'function': f"{function} ({os.path.basename(filename)}:{line})" if line else function,
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:PROFILE_TOP_N]
+
+
+def profiled_request():
+    """The profile of the current request, or None when it is not profiled."""
+    if not active:
+        return None
+    return current.get()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if profiled_request() is not None:
+        conn.info.setdefault('profile_started', []).append(perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    profile = profiled_request()
+    if profile is not None and conn.info.get('profile_started'):
+        elapsed = perf_counter() - conn.info['profile_started'].pop()
+        profile['sql'].append((' '.join(statement.split())[:STATEMENT_LENGTH], elapsed * 1000))
@@ -0,0 +1,194 @@
+"""
+Query-plan guard for the API's hot paths.
+
+Builds a throwaway SQLite database populated to a realistic size, calls every
+resource through the Flask test client, and runs EXPLAIN QUERY PLAN on each
+SQL statement the requests issued. A statement fails the check when its plan
+scans a table holding LARGE_TABLE_ROWS rows or more, or sorts in a temporary
+B-tree for ORDER BY, unless an ALLOWLIST entry covers it.
+
+    python query_plans.py        # exits 1 and prints the offending plans on failure
+    python query_plans.py -v     # also prints every plan that passed
+"""
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# The app binds its engine at import, so the scratch database must be chosen first.
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+os.environ['DB_URI'] = f"sqlite:///{DATABASE_PATH}"
+
+from sqlalchemy import event
+
+# Local imports
+from app import app
+from config import bcrypt, db
+from models import User, Letter, TimeCapsule, UserNote, SoulNote
+from rebuild_activity import rebuild
+
+LARGE_TABLE_ROWS = 1000
+# Every table the requests touch must reach LARGE_TABLE_ROWS, or a full scan of
+# it goes unnoticed; users especially, for the signup and login lookups.
+USERS = LARGE_TABLE_ROWS * 2
+LETTERS_PER_USER = 10
+NOTES_PER_USER = 5
+CAPSULES_PER_USER = 2
+SOUL_NOTES = 500
+
+# (plan detail pattern, reason). A plan step matching one of these is accepted.
+ALLOWLIST = [
+    (r'^SCAN (TABLE )?soul_notes\b', "random soul note: COUNT(*) and OFFSET have to walk the table"),
+]
+
+SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR .*ORDER BY')
+
+
+def populate():
+    db.create_all()
+    password_hash = bcrypt.generate_password_hash(b'password').decode('utf-8')
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'user{n}', 'email': f'user{n}@example.com', '_password_hash': password_hash, 'created_at': now}
+        for n in range(1, USERS + 1)
+    ])
+    db.session.execute(Letter.__table__.insert(), [
+        {'user_id': user_id, 'title': f'Letter {n}', 'content': 'Dear future me,', 'created_at': now - timedelta(hours=n)}
+        for user_id in range(1, USERS + 1) for n in range(LETTERS_PER_USER)
+    ])
+    db.session.execute(UserNote.__table__.insert(), [
+        {'user_id': user_id, 'content': 'A note to self.', 'created_at': now - timedelta(hours=n)}
+        for user_id in range(1, USERS + 1) for n in range(NOTES_PER_USER)
+    ])
+    db.session.execute(TimeCapsule.__table__.insert(), [
+        {'user_id': user_id, 'message': 'Open me later.', 'open_date': now + timedelta(days=n + 1), 'created_at': now}
+        for user_id in range(1, USERS + 1) for n in range(CAPSULES_PER_USER)
+    ])
+    db.session.execute(SoulNote.__table__.insert(), [
+        {'message': f'Soul note {n}', 'category': 'peace'} for n in range(SOUL_NOTES)
+    ])
+    db.session.commit()
+    rebuild()
+
+
+def call(client, method, path, **kwargs):
+    response = client.open(path, method=method, **kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.get_data(as_text=True)}")
+    return response
+
+
+def exercise(client):
+    """Calls every resource once, yielding a label as each request completes."""
+    call(client, 'POST', '/signup', json={
+        'username': 'planner', 'email': 'planner@example.com',
+        'password': 'password', 'password_confirmation': 'password',
+    })
+    yield 'POST /signup'
+    call(client, 'DELETE', '/logout')
+    yield 'DELETE /logout'
+    call(client, 'POST', '/login', json={'identifier': 'PLANNER', 'password': 'password'})
+    yield 'POST /login'
+    call(client, 'GET', '/check_session')
+    yield 'GET /check_session'
+
+    open_date = (datetime.utcnow() + timedelta(days=30)).isoformat()
+    collections = [
+        ('/letters', {'title': 'Plan', 'content': 'Checking plans.'}, {'title': 'Plan, again'}),
+        ('/user_notes', {'content': 'Checking plans.'}, {'content': 'Still checking.'}),
+        ('/time_capsules', {'message': 'Checking plans.', 'open_date': open_date}, {'message': 'Still checking.'}),
+    ]
+    for path, body, changes in collections:
+        item_id = call(client, 'POST', path, json=body).get_json()['id']
+        yield f'POST {path}'
+        call(client, 'GET', path)
+        yield f'GET {path}'
+        call(client, 'GET', f'{path}?fields=id,preview&preview_length=40')
+        yield f'GET {path}?fields=id,preview'
+        call(client, 'GET', f'{path}/{item_id}')
+        yield f'GET {path}/<id>'
+        call(client, 'PATCH', f'{path}/{item_id}', json=changes)
+        yield f'PATCH {path}/<id>'
+        call(client, 'DELETE', f'{path}/{item_id}')
+        yield f'DELETE {path}/<id>'
+
+    for path in ('/me/activity', '/soul_notes/random', '/loop_breaker/prompt', '/breath_ground'):
+        call(client, 'GET', path)
+        yield f'GET {path}'
+
+
+def capture_statements():
+    """Runs exercise() and returns {statement: (label, parameters)} for each distinct statement."""
+    statements = {}
+    pending = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(('PRAGMA', 'EXPLAIN')):
+            pending.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for label in exercise(app.test_client()):
+            for statement, parameters in pending:
+                statements.setdefault(statement, (label, parameters))
+            pending.clear()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def row_counts():
+    with db.engine.connect() as conn:
+        return {
+            table.name: conn.execute(db.select(db.func.count()).select_from(table)).scalar()
+            for table in db.metadata.sorted_tables
+        }
+
+
+def problems(plan, counts):
+    """The plan steps that break the rules and are not allowlisted."""
+    found = []
+    for detail in plan:
+        if any(re.search(pattern, detail) for pattern, _ in ALLOWLIST):
+            continue
+        scan = SCAN.match(detail)
+        if scan and counts.get(scan.group(1), 0) >= LARGE_TABLE_ROWS:
+            found.append(f"full scan of {scan.group(1)} ({counts[scan.group(1)]} rows): {detail}")
+        elif TEMP_SORT.search(detail):
+            found.append(f"temporary sort: {detail}")
+    return found
+
+
+def check(verbose=False):
+    populate()
+    counts = row_counts()
+    statements = capture_statements()
+
+    failures = 0
+    with db.engine.connect() as conn:
+        for statement, (label, parameters) in statements.items():
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            plan = [row[-1] for row in rows]
+            found = problems(plan, counts)
+            if found or verbose:
+                print(f"{'FAIL' if found else 'ok'}  {label}\n    {' '.join(statement.split())}")
+                for detail in plan:
+                    print(f"      {detail}")
+                for problem in found:
+                    print(f"    ! {problem}")
+            failures += bool(found)
+
+    print(f"{len(statements)} statements checked, {failures} with unallowed scans or sorts.")
+    return failures
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            failures = check(verbose='-v' in sys.argv[1:])
+        finally:
+            db.engine.dispose()
+            os.remove(DATABASE_PATH)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,150 @@
+"""
+Attempt limits for login and signup, checked before any database query or
+bcrypt work so a credential-stuffing burst is turned away cheaply.
+
+Each limit is a token bucket in GCRA form: per key it stores a single float,
+the time at which the bucket will be full again, so `attempts` tries are
+allowed at once and then one more every `window / attempts` seconds. Keys are
+the lower-cased identifier and the client IP, each with its own allowance.
+
+State lives in a bounded in-process LRU (RATE_LIMIT_KEYS entries), so each
+worker counts on its own. Set RATE_LIMIT_DB to a file path to share the
+buckets between workers on one host through a small SQLite database instead.
+
+The IP is the request's remote address. Behind a reverse proxy that is the
+proxy's address, which turns the per-IP limit into one limit for the whole
+site; set TRUSTED_PROXIES to the number of proxies in front of the app so the
+client address is read from X-Forwarded-For (see config.py).
+
+rate_limit_check.py verifies that rejected attempts stay cheap.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from math import ceil
+from time import time
+
+RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB')
+RATE_LIMIT_KEYS = int(os.environ.get('RATE_LIMIT_KEYS', 50000))
+ATTEMPT_WINDOW = int(os.environ.get('ATTEMPT_WINDOW', 300))
+ATTEMPTS_PER_IDENTIFIER = int(os.environ.get('ATTEMPTS_PER_IDENTIFIER', 10))
+ATTEMPTS_PER_IP = int(os.environ.get('ATTEMPTS_PER_IP', 50))
+PRUNE_EVERY = 1000
+
+
+class MemoryStore:
+    """Per-process buckets in an LRU that drops the least recently used key when full."""
+
+    def __init__(self, max_keys=RATE_LIMIT_KEYS):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def swap(self, key, update, now):
+        """Replaces the bucket at `key` with update(bucket), returning the wait it reports."""
+        with self.lock:
+            bucket, wait = update(self.buckets.get(key))
+            if bucket is not None:
+                self.buckets[key] = bucket
+                self.buckets.move_to_end(key)
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteStore:
+    """Buckets in a local SQLite file, shared by every worker that opens it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.writes = 0
+
+    def connection(self):
+        """
+        This thread's connection, opened on first use. SQLite connections must
+        not cross fork(), and with preload_app the store is built in the
+        gunicorn master, so a connection inherited from another process is
+        set aside (not closed, which would touch the parent's locks) and a new
+        one opened.
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            if conn is not None:
+                self.local.inherited = conn
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, full_at REAL NOT NULL) WITHOUT ROWID")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def swap(self, key, update, now):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT full_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            bucket, wait = update(row[0] if row else None)
+            if bucket is not None:
+                conn.execute("INSERT OR REPLACE INTO buckets (key, full_at) VALUES (?, ?)", (key, bucket))
+            self.writes += 1
+            if self.writes % PRUNE_EVERY == 0:
+                # Buckets that are full again carry no state worth keeping.
+                conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class Limit:
+    """Allows `attempts` tries per key at once, refilling one every `window / attempts` seconds."""
+
+    def __init__(self, store, name, attempts, window):
+        self.store = store
+        self.name = name
+        self.interval = window / attempts
+        self.tolerance = window - self.interval
+
+    def hit(self, key, now=None):
+        """Records an attempt for `key`; returns 0 if allowed, else the seconds until one is."""
+        now = time() if now is None else now
+
+        def update(full_at):
+            # A rejection returns no bucket, so it never stores or refreshes a key.
+            full_at = max(full_at or now, now)
+            if full_at - now > self.tolerance:
+                return None, full_at - now - self.tolerance
+            return full_at + self.interval, 0.0
+
+        return self.store.swap(f"{self.name}:{key}", update, now)
+
+
+class AttemptLimits:
+    """The identifier and IP limits for one action, e.g. login."""
+
+    def __init__(self, store, action, per_identifier=ATTEMPTS_PER_IDENTIFIER, per_ip=ATTEMPTS_PER_IP, window=ATTEMPT_WINDOW):
+        self.identifier = Limit(store, f"{action}:identifier", per_identifier, window)
+        self.ip = Limit(store, f"{action}:ip", per_ip, window)
+
+    def retry_after(self, identifier, ip):
+        """
+        Records an attempt; returns 0 if it may proceed, else whole seconds to
+        wait. An attempt the IP limit rejects stops there: recording it against
+        the identifier would let one IP spray made-up identifiers into the
+        store and evict a locked-out account's bucket from the LRU.
+        """
+        now = time()
+        wait = self.ip.hit(ip or 'unknown', now)
+        if wait:
+            return ceil(wait)
+        if identifier and isinstance(identifier, str):
+            wait = self.identifier.hit(identifier.strip().lower(), now)
+        return ceil(wait)
+
+
+store = SQLiteStore(RATE_LIMIT_DB) if RATE_LIMIT_DB else MemoryStore()
+login_limits = AttemptLimits(store, 'login')
+signup_limits = AttemptLimits(store, 'signup')
@@ -0,0 +1,207 @@
+"""
+Checks that the login and signup limits turn attempts away cheaply.
+
+Against a throwaway SQLite database it drives the real /login and /signup
+endpoints past their limits and verifies that:
+
+- rejected attempts get a 429 with Retry-After, and issue no SQL and no
+  bcrypt call;
+- a rejected request costs at most MAX_REJECTED_SHARE of a failed login that
+  does reach bcrypt, and one limiter check stays under MAX_CHECK_US;
+- the in-memory store stays within its key bound, and identifiers sprayed
+  from an IP that is already rejected cannot evict a locked-out account;
+- the shared SQLite store opens a fresh connection after fork() and shares
+  buckets between processes.
+
+    python rate_limit_check.py    # exits 1 and prints the failed checks
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+# The app binds its engine at import, so the scratch database must be chosen first.
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'rate_limit_check.db')
+os.environ['DB_URI'] = f"sqlite:///{DATABASE_PATH}"
+os.environ.pop('RATE_LIMIT_DB', None)
+
+from sqlalchemy import event
+
+# Local imports
+from app import app
+from config import db
+import models
+from rate_limit import (
+    ATTEMPTS_PER_IDENTIFIER, ATTEMPTS_PER_IP,
+    AttemptLimits, MemoryStore, SQLiteStore,
+)
+
+REJECTED_REQUESTS = 200
+ALLOWED_REQUESTS = 5
+LIMITER_CHECKS = 20000
+MAX_REJECTED_SHARE = 0.05
+MAX_CHECK_US = {'memory': 200, 'sqlite': 2000}
+
+failures = []
+
+
+def expect(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+class Counter:
+    """Counts SQL statements and bcrypt calls made while it is active."""
+
+    def __init__(self):
+        self.statements = 0
+        self.bcrypt_calls = 0
+        self.active = False
+        event.listen(db.engine, 'before_cursor_execute', self.count_statement)
+        for name in ('check_password_hash', 'generate_password_hash'):
+            setattr(models.bcrypt, name, self.counting(getattr(models.bcrypt, name)))
+
+    def count_statement(self, *args):
+        self.statements += self.active
+
+    def counting(self, function):
+        def wrapper(*args, **kwargs):
+            self.bcrypt_calls += self.active
+            return function(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        self.statements = self.bcrypt_calls = 0
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+
+def post(client, path, body, ip):
+    started = perf_counter()
+    response = client.post(path, json=body, environ_base={'REMOTE_ADDR': ip})
+    return response, perf_counter() - started
+
+
+def check_rejections(client, counter):
+    """Per-identifier and per-IP rejections for both endpoints."""
+    scenarios = [
+        ('login, same identifier', '/login', ATTEMPTS_PER_IDENTIFIER,
+         lambda n: ({'identifier': 'victim', 'password': 'wrong-password'}, f'10.1.{n // 250}.{n % 250}')),
+        ('login, same IP', '/login', ATTEMPTS_PER_IP,
+         lambda n: ({'identifier': f'user{n}', 'password': 'wrong-password'}, '10.2.0.1')),
+        ('signup, same email', '/signup', ATTEMPTS_PER_IDENTIFIER,
+         lambda n: ({'username': f'new{n}', 'email': 'taken@example.com', 'password': 'password',
+                     'password_confirmation': 'mismatch'}, f'10.3.{n // 250}.{n % 250}')),
+    ]
+    for label, path, allowed, attempt in scenarios:
+        for n in range(allowed):
+            post(client, path, *attempt(n))
+        seconds = 0.0
+        statuses = set()
+        with counter:
+            for n in range(allowed, allowed + REJECTED_REQUESTS):
+                response, elapsed = post(client, path, *attempt(n))
+                statuses.add(response.status_code)
+                seconds += elapsed
+        retry_after = response.headers.get('Retry-After', '')
+        expect(statuses == {429} and retry_after.isdigit(), f"{label}: every attempt past the limit gets 429 with Retry-After")
+        expect(counter.statements == 0, f"{label}: rejected attempts ran {counter.statements} SQL statements")
+        expect(counter.bcrypt_calls == 0, f"{label}: rejected attempts made {counter.bcrypt_calls} bcrypt calls")
+        yield seconds / REJECTED_REQUESTS
+
+
+def allowed_failure_seconds(client):
+    """Mean cost of a failed login that reaches bcrypt."""
+    client.post('/signup', json={
+        'username': 'member', 'email': 'member@example.com',
+        'password': 'password', 'password_confirmation': 'password',
+    }, environ_base={'REMOTE_ADDR': '10.4.0.1'})
+    seconds = 0.0
+    for n in range(ALLOWED_REQUESTS):
+        response, elapsed = post(client, '/login', {'identifier': 'member', 'password': 'wrong-password'}, f'10.5.0.{n}')
+        expect(response.status_code == 401, f"failed login {n + 1} reaches the password check")
+        seconds += elapsed
+    return seconds / ALLOWED_REQUESTS
+
+
+def check_seconds(store):
+    """Mean cost of one limiter check that rejects."""
+    limits = AttemptLimits(store, 'check', per_identifier=1, per_ip=LIMITER_CHECKS * 2)
+    limits.retry_after('victim', '10.6.0.1')
+    started = perf_counter()
+    for _ in range(LIMITER_CHECKS):
+        limits.retry_after('victim', '10.6.0.1')
+    return (perf_counter() - started) / LIMITER_CHECKS
+
+
+def check_memory_bound():
+    store = MemoryStore(max_keys=100)
+    limits = AttemptLimits(store, 'bound')
+    for n in range(1000):
+        limits.retry_after(f'user{n}', f'10.7.{n // 250}.{n % 250}')
+    expect(len(store.buckets) == 100, f"memory store holds {len(store.buckets)} keys with a bound of 100")
+
+
+def check_spray():
+    """Requests the IP limit rejects must not add identifier keys that push a lockout out of the LRU."""
+    store = MemoryStore(max_keys=1000)
+    limits = AttemptLimits(store, 'spray', per_identifier=2, per_ip=100)
+    for n in range(3):
+        limits.retry_after('victim', f'10.9.0.{n}')
+    expect(limits.retry_after('victim', '10.9.1.1') > 0, "victim is locked out before the spray")
+    keys = len(store.buckets)
+    rejected = sum(limits.retry_after(f'made-up{n}', '10.9.2.1') > 0 for n in range(1200))
+    expect(rejected == 1100, f"{rejected} of 1200 sprayed identifiers rejected by the IP limit")
+    expect(len(store.buckets) == keys + 101, f"sprayed attempts added {len(store.buckets) - keys} keys (at most 101)")
+    expect(limits.retry_after('victim', '10.9.1.2') > 0, "victim is still locked out after the spray")
+
+
+def check_fork(store):
+    """A child must not reuse the parent's connection, and must see and update the same buckets."""
+    limits = AttemptLimits(store, 'fork', per_identifier=2, per_ip=100)
+    limits.retry_after('shared', '10.8.0.1')
+    parent_connection = store.connection()
+    pid = os.fork()
+    if pid == 0:
+        own = store.connection() is not parent_connection
+        allowed = limits.retry_after('shared', '10.8.0.2') == 0
+        os._exit(0 if own and allowed else 1)
+    _, status = os.waitpid(pid, 0)
+    expect(os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0, "forked child opens its own SQLite connection and is allowed the second attempt")
+    expect(limits.retry_after('shared', '10.8.0.3') > 0, "the parent sees the attempt the child recorded")
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            db.create_all()
+            client = app.test_client()
+            counter = Counter()
+
+            rejected = max(check_rejections(client, counter))
+            allowed = allowed_failure_seconds(client)
+            expect(
+                rejected <= allowed * MAX_REJECTED_SHARE,
+                f"rejected request {rejected * 1000:.2f} ms vs failed login {allowed * 1000:.1f} ms "
+                f"(at most {MAX_REJECTED_SHARE:.0%})",
+            )
+
+            memory = check_seconds(MemoryStore()) * 1e6
+            expect(memory <= MAX_CHECK_US['memory'], f"in-memory limiter check {memory:.1f} us (at most {MAX_CHECK_US['memory']})")
+            sqlite_store = SQLiteStore(os.path.join(os.path.dirname(DATABASE_PATH), 'limits.db'))
+            shared = check_seconds(sqlite_store) * 1e6
+            expect(shared <= MAX_CHECK_US['sqlite'], f"SQLite limiter check {shared:.1f} us (at most {MAX_CHECK_US['sqlite']})")
+
+            check_memory_bound()
+            check_spray()
+            check_fork(sqlite_store)
+        finally:
+            db.engine.dispose()
+            os.remove(DATABASE_PATH)
+
+    print(f"{len(failures)} checks failed." if failures else "All rate limit checks passed.")
+    sys.exit(1 if failures else 0)
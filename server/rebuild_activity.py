@@ -0,0 +1,57 @@
+import os
+
+from sqlalchemy import literal, select, union_all
+
+# Local imports
+from config import app, db
+from models import Letter, TimeCapsule, UserNote, UserDailyActivity
+
+BATCH_SIZE = int(os.environ.get('BATCH_SIZE', 1000))
+
+
+def daily_counts():
+    """One grouped pass over all three base tables, yielding a row per user and day."""
+    items = union_all(
+        select(Letter.user_id, Letter.created_at, literal(1).label('letter'), literal(0).label('note'), literal(0).label('capsule')),
+        select(UserNote.user_id, UserNote.created_at, literal(0), literal(1), literal(0)),
+        select(TimeCapsule.user_id, TimeCapsule.created_at, literal(0), literal(0), literal(1)),
+    ).subquery()
+    day = db.func.date(items.c.created_at, type_=db.Date)
+    return db.session.execute(
+        select(
+            items.c.user_id,
+            day,
+            db.func.sum(items.c.letter),
+            db.func.sum(items.c.note),
+            db.func.sum(items.c.capsule),
+        )
+        .where(items.c.created_at.isnot(None))
+        .group_by(items.c.user_id, day)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+
+
+def rebuild():
+    """Replaces every rollup row inside a single transaction, inserting BATCH_SIZE rows at a time."""
+    UserDailyActivity.query.delete()
+    rows = 0
+    for partition in daily_counts().partitions():
+        db.session.execute(UserDailyActivity.__table__.insert(), [
+            {
+                'user_id': user_id,
+                'day': day,
+                'letter_count': letters,
+                'note_count': notes,
+                'capsule_count': capsules,
+            }
+            for user_id, day, letters, notes, capsules in partition
+        ])
+        rows += len(partition)
+    db.session.commit()
+    return rows
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        print("Rebuilding user daily activity...")
+        print(f"Rebuilt {rebuild()} user daily activity rows.")
@@ -0,0 +1,265 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+gzip is always available; brotli and zstd are offered when the `brotli` and
+`zstandard` packages are installed. Bodies below MINIMUM_SIZE are sent as is,
+since the framing overhead outweighs the savings.
+"""
+import hashlib
+import re
+import zlib
+from collections import OrderedDict, defaultdict
+from time import thread_time
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+MINIMUM_SIZE = 1024
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+CACHE_ENTRIES = 64
+
+
+class Gzip:
+    name = 'gzip'
+
+    def compress(self, data):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return (
+            lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush,
+        )
+
+
+class Brotli:
+    name = 'br'
+
+    def compress(self, data):
+        return brotli.compress(data, quality=5)
+
+    def stream(self):
+        compressor = brotli.Compressor(quality=5)
+        return (
+            lambda data: compressor.process(data) + compressor.flush(),
+            compressor.finish,
+        )
+
+
+class Zstd:
+    name = 'zstd'
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=3).compress(data)
+
+    def stream(self):
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        return (
+            lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+
+
+# Server preference, used to break ties between equally weighted encodings.
+ENCODERS = [encoder for encoder, available in (
+    (Brotli(), brotli is not None),
+    (Zstd(), zstandard is not None),
+    (Gzip(), True),
+) if available]
+
+
+def encoding_weights(accept_encoding):
+    """Maps each coding in an Accept-Encoding header to its q-value."""
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        match = re.search(r'q=([0-9.]+)', params)
+        try:
+            weights[name.strip().lower()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            continue
+    return weights
+
+
+def accepts(weights, coding):
+    return weights.get(coding, weights.get('*', 0)) > 0
+
+
+def negotiate(accept_encoding):
+    """The best encoder the client accepts with a non-zero q-value, or None."""
+    weights = encoding_weights(accept_encoding)
+    best = None
+    for encoder in ENCODERS:
+        weight = weights.get(encoder.name, weights.get('*', 0))
+        if weight > 0 and (best is None or weight > best[0]):
+            best = (weight, encoder)
+    return best[1] if best else None
+
+
+def compressible(headers):
+    """Whether a response with these (lower-cased) headers may be compressed at all."""
+    content_type = headers.get('content-type', '')
+    return (
+        'content-encoding' not in headers
+        and 'content-range' not in headers
+        and 'no-transform' not in headers.get('cache-control', '')
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing responses for clients that accept it.
+
+    Responses with a Content-Length are compressed in one go once they reach
+    MINIMUM_SIZE. Streaming responses (no Content-Length) are compressed chunk
+    by chunk, flushing after each so clients still see data as it is produced.
+    Compressed bodies for GET requests to `cacheable_paths` are kept, keyed by
+    a hash of the uncompressed body, so fixed payloads are compressed once.
+
+    `stats` holds, per endpoint, the responses compressed, bytes before and
+    after, and the CPU seconds spent compressing.
+    """
+
+    def __init__(self, app, cacheable_paths=()):
+        self.app = app
+        self.cacheable_paths = set(cacheable_paths)
+        self.cache = OrderedDict()
+        self.stats = defaultdict(lambda: {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0})
+
+    def __call__(self, environ, start_response):
+        encoder = None if environ['REQUEST_METHOD'] == 'HEAD' else negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+
+        app_iter = self.app(environ, capture)
+        if not captured:
+            # start_response is only required before the first chunk is produced.
+            rest = iter(app_iter)
+            app_iter = chain_close([next(rest, b'')], rest, app_iter)
+
+        status, headers = captured['status'], list(captured['headers'])
+        lowered = {name.lower(): value for name, value in headers}
+        # A 206 body is a byte range of the identity encoding; compressing it would break the range.
+        if status[:3] in ('204', '206', '304') or not compressible(lowered):
+            start_response(status, headers, captured['exc_info'])
+            return app_iter
+
+        headers = add_vary(headers, 'Accept-Encoding')
+        if encoder is None:
+            start_response(status, headers, captured['exc_info'])
+            return app_iter
+
+        endpoint = endpoint_name(environ.get('PATH_INFO', ''))
+        if 'content-length' in lowered:
+            return self.compress_whole(environ, start_response, captured, headers, app_iter, encoder, endpoint)
+        return self.compress_stream(start_response, captured, headers, app_iter, encoder, endpoint)
+
+    def compress_whole(self, environ, start_response, captured, headers, app_iter, encoder, endpoint):
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        if len(body) < MINIMUM_SIZE:
+            start_response(captured['status'], headers, captured['exc_info'])
+            return [body]
+
+        compressed = self.compress_body(environ['REQUEST_METHOD'], environ.get('PATH_INFO'), body, encoder, endpoint)
+        headers = [(name, value) for name, value in weaken_etag(headers) if name.lower() != 'content-length']
+        headers += [('Content-Encoding', encoder.name), ('Content-Length', str(len(compressed)))]
+        start_response(captured['status'], headers, captured['exc_info'])
+        return [compressed]
+
+    def compress_body(self, method, path, body, encoder, endpoint):
+        """Compresses a whole response body, through the cache for `cacheable_paths`. Also used by asgi.py."""
+        cache_key = None
+        if path in self.cacheable_paths and method == 'GET':
+            cache_key = (path, encoder.name, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self.cache.get(cache_key) if cache_key else None
+        if compressed is None:
+            started = thread_time()
+            compressed = encoder.compress(body)
+            self.record(endpoint, len(body), len(compressed), thread_time() - started)
+            if cache_key:
+                self.cache[cache_key] = compressed
+                if len(self.cache) > CACHE_ENTRIES:
+                    self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(cache_key)
+            self.record(endpoint, len(body), len(compressed), 0.0)
+        return compressed
+
+    def compress_stream(self, start_response, captured, headers, app_iter, encoder, endpoint):
+        headers = weaken_etag(headers)
+        headers.append(('Content-Encoding', encoder.name))
+        start_response(captured['status'], headers, captured['exc_info'])
+        compress, finish = encoder.stream()
+
+        def generate():
+            try:
+                for chunk in app_iter:
+                    if chunk:
+                        started = thread_time()
+                        compressed = compress(chunk)
+                        self.record(endpoint, len(chunk), len(compressed), thread_time() - started, responses=0)
+                        yield compressed
+                tail = finish()
+                self.record(endpoint, 0, len(tail), 0.0)
+                yield tail
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        return generate()
+
+    def record(self, endpoint, bytes_in, bytes_out, cpu_seconds, responses=1):
+        stats = self.stats[endpoint]
+        stats['responses'] += responses
+        stats['bytes_in'] += bytes_in
+        stats['bytes_out'] += bytes_out
+        stats['cpu_seconds'] += cpu_seconds
+
+
+def endpoint_name(path):
+    """`path` with numeric segments replaced by <id>, the key for `stats`."""
+    return re.sub(r'/\d+(?=/|$)', '/<id>', path)
+
+
+def add_vary(headers, field):
+    """Adds `field` to the response's Vary header, merging with an existing one."""
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if field.lower() not in (part.strip().lower() for part in value.split(',')):
+                headers[index] = (name, f"{value}, {field}")
+            return headers
+    headers.append(('Vary', field))
+    return headers
+
+
+def weaken_etag(headers):
+    """Marks a strong ETag weak, since the compressed body is not byte-identical to the one it names."""
+    return [
+        (name, f"W/{value}") if name.lower() == 'etag' and not value.startswith('W/') else (name, value)
+        for name, value in headers
+    ]
+
+
+def chain_close(head, rest, app_iter):
+    """Yields `head` then `rest`, closing the original `app_iter` when done."""
+    try:
+        yield from head
+        yield from rest
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
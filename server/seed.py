@@ -5,13 +5,15 @@ from faker import Faker
 
 # Local imports
 from config import app, db  
-from models import User, Letter, TimeCapsule, UserNote, SoulNote
+from models import User, Letter, TimeCapsule, UserNote, SoulNote, UserDailyActivity
+from rebuild_activity import rebuild as rebuild_activity
 
 fake = Faker()
 
 if __name__ == '__main__':
     with app.app_context():
         print("Clearing existing data...")
+        UserDailyActivity.query.delete()
         UserNote.query.delete()
         TimeCapsule.query.delete()
         Letter.query.delete()
@@ -98,4 +100,6 @@ if __name__ == '__main__':
             db.session.add(note)
         db.session.commit()
         print(f"Created {len(messages)} soul notes.")
+
+        print(f"Rebuilt {rebuild_activity()} user daily activity rows.")
         print("Seed data creation complete!")
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+WSGI entry point for production, served by a pre-fork server:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+`python app.py` remains the development server.
+"""
+# Local imports
+from config import app as flask_app
+
+
+def create_app():
+    """
+    Returns the API ready to serve. config.py builds the Flask app at import
+    time and importing app.py registers every resource on it, so this
+    finishes setup on that single app rather than building a new one.
+    """
+    import app  # noqa: F401  (registers routes and resources)
+
+    flask_app.debug = False
+    return flask_app
+
+
+app = create_app()